@@ -0,0 +1,383 @@
+# audio_pipeline.py
+"""
+Float32 processing pipeline for recorded takes.
+
+A take is loaded once as a float32 array shaped (frames, channels) and
+passed through a list of stages. Each stage takes and returns such an
+array, working in place or on views where it can. Samples are quantized
+exactly once, when the result is written.
+"""
+import numpy as np
+import soundfile as sf
+
+DEFAULT_CHUNK_FRAMES = 65536  # Frames per chunk for streaming stages
+
+
+def iter_chunks(audio, chunk_frames=DEFAULT_CHUNK_FRAMES):
+    """Yield consecutive views of at most chunk_frames frames"""
+    for start in range(0, audio.shape[0], chunk_frames):
+        yield audio[start:start + chunk_frames]
+
+
+def load_audio(path):
+    """
+    Load an audio file as float32.
+
+    :param path: Path of the file to read.
+    :return: (audio, sample_rate), audio shaped (frames, channels).
+    """
+    audio, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    return audio, sample_rate
+
+
+def write_audio(path, audio, sample_rate, subtype="PCM_16"):
+    """
+    Write float32 audio, quantizing (with clipping) to `subtype`.
+
+    :param path: Output file path.
+    :param audio: Array shaped (frames, channels).
+    :param sample_rate: Sample rate in Hz.
+    :param subtype: soundfile subtype, e.g. "PCM_16", "PCM_24" or "FLOAT".
+    """
+    sf.write(path, audio, sample_rate, subtype=subtype)
+
+
+class ToMono:
+    """Average all channels into one"""
+
+    def process(self, audio, sample_rate):
+        if audio.shape[1] == 1:
+            return audio
+        return audio.mean(axis=1, keepdims=True, dtype=np.float32)
+
+    __call__ = process
+
+
+class Normalize:
+    """Scale so the peak sits `headroom_db` below full scale (pydub's normalize, in float)"""
+
+    def __init__(self, headroom_db=0.1):
+        self.headroom_db = headroom_db
+
+    def process(self, audio, sample_rate):
+        peak = np.abs(audio).max() if audio.size else 0.0
+        if peak > 0:
+            audio *= np.float32(10 ** (-self.headroom_db / 20) / peak)
+        return audio
+
+    __call__ = process
+
+
+class Effects:
+    """Run a Pedalboard (or anything called like one) over the whole take"""
+
+    def __init__(self, board):
+        self.board = board
+
+    def process(self, audio, sample_rate):
+        if len(self.board) == 0:
+            return audio
+        # pedalboard returns a new array; it cannot process in place
+        return self.board(np.ascontiguousarray(audio), sample_rate)
+
+    __call__ = process
+
+
+class Filter:
+    """
+    Run a FilterBank (pedalboard/iir_filter.py) over the take.
+
+    When streamed, the filter state carries from chunk to chunk, so the
+    result is identical to filtering the whole take at once.
+    """
+
+    def __init__(self, bank):
+        self.bank = bank
+
+    def stream(self, chunks, sample_rate):
+        self.bank.reset()
+        for chunk in chunks:
+            yield self.bank(chunk, sample_rate, reset=False)
+
+    def process(self, audio, sample_rate):
+        return self.bank(audio, sample_rate)
+
+    __call__ = process
+
+
+class PhaseVocoder:
+    """
+    Streaming phase-vocoder time stretch, vectorized over all frames of a chunk.
+
+    Analysis frames are taken every `hop * speed` input samples and
+    overlap-added every `hop` output samples. Each bin's phase is advanced
+    by its instantaneous frequency and the advances are accumulated with a
+    cumulative sum, so all frames of a chunk go through a few batched numpy
+    calls. The window and FFT size never change, so numpy reuses one FFT
+    plan for every frame.
+
+    About one frame of input and output is carried between calls, so
+    memory is bounded by the chunk size, not the length of the take.
+    """
+
+    def __init__(self, speed, channels=1, n_fft=2048, hop=512):
+        if n_fft % hop:
+            raise ValueError("n_fft must be a multiple of hop")
+        self.speed = speed
+        self.channels = channels
+        self.n_fft = n_fft
+        self.hop = hop
+        self.window = np.hanning(n_fft + 1)[:-1]  # Periodic Hann
+        # Hann analysis and synthesis windows overlap-add to a constant; undo it
+        self.gain = hop / (self.window ** 2).sum()
+        self.omega = 2 * np.pi * np.arange(n_fft // 2 + 1) / n_fft  # Bin frequencies, radians/sample
+        self.reset()
+
+    def reset(self):
+        # Half a frame of leading silence centres the first frame on sample 0
+        self._input = np.zeros((self.n_fft // 2, self.channels), dtype=np.float32)
+        self._position = 0.0  # Next analysis frame start in _input, fractional
+        self._last_start = 0  # Start of the previous analysis frame in _input
+        self._last_phase = None  # Analysis phase of the previous frame
+        self._phase = None  # Synthesis phase of the previous frame
+        self._overlap = np.zeros((self.n_fft - self.hop, self.channels), dtype=np.float32)
+        self._to_skip = self.n_fft // 2  # Output belonging to the leading silence
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def push(self, chunk):
+        """Feed (frames, channels) input. Returns the output completed so far."""
+        self.frames_in += chunk.shape[0]
+        self._input = np.concatenate((self._input, chunk))
+        return self._emit(self._run_frames())
+
+    def flush(self):
+        """Return the rest of the output, trimmed so the total is frames_in / speed"""
+        # A frame of trailing silence lets the last input samples reach a frame centre
+        silence = np.zeros((self.n_fft, self.channels), dtype=np.float32)
+        self._input = np.concatenate((self._input, silence))
+        out = self._emit(np.concatenate((self._run_frames(), self._overlap)))
+        self._overlap = self._overlap[:0]
+
+        total = int(round(self.frames_in / self.speed))
+        excess = self.frames_out - total
+        if excess > 0:
+            out = out[:out.shape[0] - excess]
+        elif excess < 0:
+            out = np.concatenate((out, np.zeros((-excess, self.channels), dtype=np.float32)))
+        self.frames_out = total
+        return out
+
+    def _emit(self, out):
+        if self._to_skip:
+            skip = min(self._to_skip, out.shape[0])
+            out = out[skip:]
+            self._to_skip -= skip
+        self.frames_out += out.shape[0]
+        return out
+
+    def _run_frames(self):
+        """Process every analysis frame that fits in the buffered input"""
+        n, hop = self.n_fft, self.hop
+        step = hop * self.speed
+        last_start = self._input.shape[0] - n
+        if last_start < self._position:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        count = int((last_start - self._position) // step) + 1
+        positions = self._position + step * np.arange(count)
+        starts = np.round(positions).astype(np.intp)
+
+        # All frames at once: (frames, channels, n_fft)
+        frames = self._input[starts[:, np.newaxis] + np.arange(n)].transpose(0, 2, 1)
+        spectra = np.fft.rfft(frames * self.window, axis=-1)
+        magnitude = np.abs(spectra)
+        phase = np.angle(spectra)
+
+        # Instantaneous frequency from the phase change between analysis frames
+        first = self._phase is None
+        if first:
+            self._last_phase = phase[0]
+            self._last_start = starts[0]
+            self._phase = phase[0]
+        previous = np.concatenate((self._last_phase[np.newaxis], phase[:-1]))
+        distance = np.diff(starts, prepend=self._last_start)[:, np.newaxis, np.newaxis]
+        deviation = phase - previous - self.omega * distance
+        deviation = np.mod(deviation + np.pi, 2 * np.pi) - np.pi
+        advance = (self.omega + deviation / np.maximum(distance, 1)) * hop
+        if first:
+            advance[0] = 0
+        synthesis = self._phase + np.cumsum(advance, axis=0)
+        self._phase = np.mod(synthesis[-1], 2 * np.pi)
+        self._last_phase = phase[-1]
+
+        # Resynthesize and overlap-add every frame in one pass per overlap
+        frames = np.fft.irfft(magnitude * np.exp(1j * synthesis), n, axis=-1) * (self.window * self.gain)
+        frames = frames.astype(np.float32).transpose(0, 2, 1)  # (frames, n_fft, channels)
+        out = np.zeros((count * hop + n - hop, self.channels), dtype=np.float32)
+        out[:n - hop] = self._overlap
+        for offset in range(0, n, hop):
+            out[offset:offset + count * hop] += frames[:, offset:offset + hop].reshape(count * hop, self.channels)
+        self._overlap = out[count * hop:]
+
+        # Drop input no later frame needs
+        next_position = positions[-1] + step
+        consumed = int(min(next_position, starts[-1]))
+        self._input = self._input[consumed:]
+        self._position = next_position - consumed
+        self._last_start = starts[-1] - consumed
+        return out[:count * hop]
+
+
+class TimeStretch:
+    """Change playback speed without changing pitch. speed > 1 is faster (shorter), < 1 slower."""
+
+    def __init__(self, speed, n_fft=2048, hop=512):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = speed
+        self.n_fft = n_fft
+        self.hop = hop
+
+    def stream(self, chunks, sample_rate):
+        vocoder = None
+        for chunk in chunks:
+            if self.speed == 1.0:
+                yield chunk
+                continue
+            if vocoder is None:
+                vocoder = PhaseVocoder(self.speed, chunk.shape[1], self.n_fft, self.hop)
+            out = vocoder.push(chunk)
+            if out.shape[0]:
+                yield out
+        if vocoder is not None:
+            yield vocoder.flush()
+
+    def process(self, audio, sample_rate):
+        if self.speed == 1.0:
+            return audio
+        return np.concatenate(list(self.stream(iter_chunks(audio), sample_rate)))
+
+    __call__ = process
+
+
+def _collect(chunks):
+    """Join streamed chunks into one buffer, without a copy if there is only one"""
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks)
+
+
+class Reverse:
+    """Play the take backwards. Returns a negative-stride view, no copy."""
+
+    def stream(self, chunks, sample_rate):
+        # Reversing needs the whole take, but only once: the output is views
+        yield from iter_chunks(_collect(chunks)[::-1])
+
+    def process(self, audio, sample_rate):
+        return audio[::-1]
+
+    __call__ = process
+
+
+class Loop:
+    """
+    Repeat the take `num_loops` times.
+
+    With `crossfade` seconds > 0, consecutive repetitions overlap by that
+    much with an equal-power crossfade, hiding the click at the seam; the
+    result is then (num_loops - 1) crossfades shorter.
+
+    When streamed, the repetitions are yielded as views of the one source
+    buffer, so memory depends on the take's length, not the rendered length.
+    """
+
+    def __init__(self, num_loops=1, crossfade=0.0):
+        self.num_loops = num_loops
+        self.crossfade = crossfade
+
+    def stream(self, chunks, sample_rate):
+        source = _collect(chunks)
+        if self.num_loops <= 1:
+            yield from iter_chunks(source)
+            return
+
+        fade = min(int(self.crossfade * sample_rate), source.shape[0] // 2)
+        if fade == 0:
+            for _ in range(self.num_loops):
+                yield from iter_chunks(source)
+            return
+
+        # The one seam shared by every repetition: tail fading out over head fading in
+        curve = np.linspace(0, np.pi / 2, fade, dtype=np.float32)[:, np.newaxis]
+        seam = source[-fade:] * np.cos(curve) + source[:fade] * np.sin(curve)
+        yield from iter_chunks(source[:-fade])
+        for repetition in range(1, self.num_loops):
+            yield seam
+            last = repetition == self.num_loops - 1
+            yield from iter_chunks(source[fade:] if last else source[fade:-fade])
+
+    def process(self, audio, sample_rate):
+        if self.num_loops <= 1:
+            return audio
+        return np.concatenate(list(self.stream([audio], sample_rate)))
+
+    __call__ = process
+
+
+class Pipeline:
+    """
+    An ordered list of stages run over one float32 buffer.
+
+    Stages are called as stage(audio, sample_rate) and return the new
+    buffer. Stages that can also run incrementally provide
+    stream(chunks, sample_rate), a generator from chunks to chunks. When
+    rendering to a file, the trailing run of such stages is streamed and
+    written chunk by chunk, so their output is never held in memory.
+
+    Example, the record_and_process chain:
+
+        Pipeline([Normalize(), ToMono(), Effects(board), TimeStretch(1.25), Reverse(),
+                  Filter(FilterBank([IIRFilter("highpass", 1000.0)])), Loop(4)])
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    def process(self, audio, sample_rate):
+        """Run every stage. The input buffer may be modified in place."""
+        for stage in self.stages:
+            audio = stage(audio, sample_rate)
+        return audio
+
+    __call__ = process
+
+    def _streaming_start(self):
+        """Index of the first stage of the trailing run of streamable stages"""
+        start = len(self.stages)
+        while start > 0 and hasattr(self.stages[start - 1], "stream"):
+            start -= 1
+        return start
+
+    def render(self, input_file, output_file, subtype="PCM_16", chunk_frames=DEFAULT_CHUNK_FRAMES):
+        """
+        Load a file, run the pipeline and write the result.
+
+        :return: Number of frames written.
+        """
+        audio, sample_rate = load_audio(input_file)
+        split = self._streaming_start()
+        for stage in self.stages[:split]:
+            audio = stage(audio, sample_rate)
+
+        chunks = iter_chunks(audio, chunk_frames)
+        for stage in self.stages[split:]:
+            chunks = stage.stream(chunks, sample_rate)
+
+        frames = 0
+        with sf.SoundFile(output_file, 'w', sample_rate, audio.shape[1], subtype=subtype) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                frames += chunk.shape[0]
+        return frames
@@ -1,42 +1,92 @@
-import time
+import os
 import threading
-import soundfile as sf
 import sounddevice as sd
 
+import pedalboard_path  # noqa: F401
+from click_track import ClickTrack, load_click
+from synced_recording import SyncedRecorder
 
-def metronome_click(bpm, recording_duration):
+CLICK_FILE = "metronome_click.wav"
+DEFAULT_SAMPLE_RATE = 44100
+
+
+def metronome_click(bpm, recording_duration, click_file=CLICK_FILE, accents=None):
     """
     Play metronome clicks at a given BPM for the duration of the recording.
 
+    The click is loaded once (or synthesized if the file is missing) and
+    mixed into a single output stream by its callback, with every beat
+    placed by sample index, so the tempo is exact and does not drift.
+
     :param bpm: Beats per minute (integer).
     :param recording_duration: Total duration to keep the metronome active, in seconds.
+    :param click_file: WAV file with the click sound.
+    :param accents: Level of each beat of the bar, e.g. (1.0, 0.5, 0.5, 0.5).
     """
-    # Calculate interval between each beat (seconds)
-    beat_interval = 60.0 / bpm
-
-    # Keep playing the click sound for the duration of the recording
-    end_time = time.time() + recording_duration
-    while time.time() < end_time:
-        try:
-            # Read the .wav file
-            data, sample_rate = sf.read("metronome_click.wav", dtype='float32')
-            # Play the audio
-            sd.play(data, samplerate=sample_rate)
-            time.sleep(beat_interval)  # Wait for the next beat
-            sd.wait()  # Wait for playback to finish
-        except Exception as e:
-            print(f"Error: {e}")
-
-
-def record_with_metronome(audio_file, bpm, record_seconds, record_audio_func):
+    if os.path.exists(click_file):
+        click, sample_rate = load_click(click_file)
+    else:
+        click, sample_rate = None, DEFAULT_SAMPLE_RATE
+    track = ClickTrack(bpm, sample_rate, accents=accents, click=click)
+
+    def callback(outdata, frames, time, status):
+        outdata.fill(0)
+        track.mix_into(outdata)
+
+    with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='float32', callback=callback):
+        sd.sleep(int(recording_duration * 1000))
+
+
+def record_synced(audio_file, bpm, record_seconds, backend=None, channels=1, latency=None, count_in_bars=1,
+                  click_file=CLICK_FILE, accents=None, device=None):
+    """
+    Record audio against a click, with both on one duplex stream clock.
+
+    After a count-in, beat 1 lands on sample 0 of the file, compensated for
+    the interface's round-trip latency, so bars can be cut by sample count.
+
+    :param audio_file: Path to save the recorded audio.
+    :param bpm: Target tempo in beats per minute.
+    :param record_seconds: Duration of the recording in seconds, from beat 1.
+    :param backend: Stream backend for the duplex stream (sounddevice by default).
+    :param channels: Number of input channels to record.
+    :param latency: Round-trip latency in frames; if None the value calibrated for `device` with
+        `python main.py calibrate-latency` is used (RuntimeError if there is none).
+    :param count_in_bars: Bars of click before the recording starts.
+    :param click_file: WAV file with the click sound.
+    :param accents: Level of each beat of the bar, e.g. (1.0, 0.5, 0.5, 0.5).
+    :param device: Name the interface's latency is calibrated under.
+    :return: Number of frames written.
+    """
+    if os.path.exists(click_file):
+        click, sample_rate = load_click(click_file)
+    else:
+        click, sample_rate = None, DEFAULT_SAMPLE_RATE
+    recorder = SyncedRecorder(audio_file, bpm, record_seconds, sample_rate=sample_rate, channels=channels,
+                              latency=latency, count_in_bars=count_in_bars, accents=accents, click=click,
+                              backend=backend, device=device)
+    print(f"Counting in {count_in_bars} bar(s), then recording for {record_seconds} seconds...")
+    frames = recorder.record()
+    print(f"Finished recording ({frames} frames).")
+    return frames
+
+
+def record_with_metronome(audio_file, bpm, record_seconds, record_audio_func=None, **synced_options):
     """
     Record audio while playing a metronome click.
 
+    Without record_audio_func the take is recorded with record_synced(), so
+    the click and the recording share one clock and line up to the sample.
+
     :param audio_file: Path to save the recorded audio.
     :param bpm: Target tempo in beats per minute.
     :param record_seconds: Duration of the recording in seconds.
-    :param record_audio_func: Function to record audio
+    :param record_audio_func: Function to record audio, on its own stream (not beat-aligned)
+    :param synced_options: Passed on to record_synced().
     """
+    if record_audio_func is None:
+        return record_synced(audio_file, bpm, record_seconds, **synced_options)
+
     # Start metronome in a separate thread
     metronome_thread = threading.Thread(target=metronome_click, args=(bpm, record_seconds))
     metronome_thread.start()
@@ -2,37 +2,80 @@
 import gradio as gr
 import numpy as np
 import os
+import threading
 import time
-import sounddevice as sd
 from pedalboard import (
     Chorus, Delay, Distortion, Gain, Reverb,
     Phaser, Compressor, Limiter, LadderFilter,
     Bitcrush, PitchShift
 )
-from effects_processor import EffectsProcessor
+from effects_processor import EffectsProcessor, DEFAULT_CHUNK_FRAMES
 from effects_presets import get_effect_presets, get_individual_effects
+from preset_pool import PresetPool
+from render_cache import RenderCache, render_key
+from streaming import StreamingUnsupportedError
+from streaming_recorder import StreamingRecorder
+from device_registry import get_registry
 
 # Create the effects processor
 processor = EffectsProcessor(sample_rate=44100, block_size=512, channels=1)
 presets = get_effect_presets()
 individual_effects = get_individual_effects()
 
+# Blocks over which a preset change crossfades from the old chain to the new one
+PRESET_CROSSFADE_BLOCKS = 8
+
+# Warmed preset chains, built in the background so switching presets is instant
+preset_pool = PresetPool(presets, sample_rate=processor.sample_rate, block_size=processor.block_size,
+                         channels=processor.channels)
+threading.Thread(target=preset_pool.prewarm, daemon=True).start()
+# (preset name, chain) pairs checked out of the pool and handed to the processor
+pooled_chains = []
+
+# Keep the default input open for record_audio, so the first take starts
+# without device setup, and pick up interfaces plugged in while the app runs
+try:
+    get_registry().arm_input(channels=1, samplerate=44100)
+except Exception as e:
+    print(f"Could not arm the default input: {e}")
+get_registry().watch_hotplug()
+
 # Setup temp directory for recordings
 TEMP_DIR = "temp"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Rendered files keyed by input audio and chain settings, so repeat requests are instant
+render_cache = RenderCache(os.path.join(TEMP_DIR, "render_cache"))
+
+
+def recycle_pooled_chains():
+    """Return pooled chains the audio thread has finished with to the pool"""
+    for name, chain in list(pooled_chains):
+        if not processor.is_chain_in_use(chain):
+            pooled_chains.remove((name, chain))
+            preset_pool.checkin(name, chain)
+
+
+def forget_current_chain():
+    """Keep the current chain out of the pool because it is about to be edited"""
+    pooled_chains[:] = [(name, chain) for name, chain in pooled_chains
+                        if chain is not processor.get_effects()]
+
 
 def apply_preset(preset_name):
     """Apply a preset to the effects chain"""
+    recycle_pooled_chains()
+
     if not preset_name or preset_name == "None":
         processor.clear_effects()
         return f"Cleared all effects"
 
     if preset_name in presets:
-        processor.clear_effects()
-        preset_board = presets[preset_name]()
-        for effect in preset_board:
-            processor.add_effect(effect)
+        # Check out a warmed chain and swap it in atomically
+        preset_board = preset_pool.checkout(preset_name)
+        pooled_chains.append((preset_name, preset_board))
+        processor.set_chain(preset_board, crossfade_blocks=PRESET_CROSSFADE_BLOCKS,
+                            warm=False, latency=preset_pool.latency(preset_name))
         return f"Applied {preset_name} preset with {len(preset_board)} effects"
 
     return f"Preset {preset_name} not found"
@@ -45,7 +88,11 @@ def add_individual_effect(effect_name):
 
     if effect_name in individual_effects:
         effect = individual_effects[effect_name]()
-        index = processor.add_effect(effect)
+        forget_current_chain()
+        try:
+            index = processor.add_effect(effect)
+        except StreamingUnsupportedError as e:
+            return f"Cannot add {effect_name}: {e}"
         return f"Added {effect_name} at position {index}"
 
     return f"Effect {effect_name} not found"
@@ -58,14 +105,19 @@ def update_effect_param(effect_index, param_name, value):
 
     try:
         index = int(effect_index)
-        success = processor.update_effect_parameter(index, param_name, value)
-        if success:
-            return f"Updated {param_name} to {value} for effect at position {index}"
-        else:
-            return f"Failed to update parameter. Check if effect exists and has this parameter."
     except ValueError:
         return "Invalid effect index"
 
+    forget_current_chain()
+    try:
+        success = processor.update_effect_parameter(index, param_name, value)
+    except (ValueError, TypeError) as e:
+        return f"Invalid value for {param_name}: {e}"
+    if success:
+        return f"Updated {param_name} to {value} for effect at position {index}"
+    else:
+        return f"Failed to update parameter. Check if effect exists and has this parameter."
+
 
 def get_current_effects():
     """Get the current effects chain as a string"""
@@ -86,7 +138,10 @@ def get_current_effects():
 def start_processing():
     """Start the audio processing"""
     if not processor.is_running:
-        processor.start()
+        try:
+            processor.start()
+        except StreamingUnsupportedError as e:
+            return f"Cannot start: {e}"
         return "Audio processing started"
     return "Audio processing already running"
 
@@ -104,19 +159,15 @@ def record_audio(seconds):
     if seconds <= 0:
         return None, "Recording duration must be positive"
 
-    # Setup recording
-    sample_rate = 44100
-    channels = 1
-    recording = sd.rec(int(seconds * sample_rate), samplerate=sample_rate, channels=channels, dtype='float32')
-    sd.wait()  # Wait until recording is finished
-
-    # Save the recording to a file
+    # Record straight to a file; memory use does not grow with the duration
     timestamp = int(time.time())
     filename = os.path.join(TEMP_DIR, f"recording_{timestamp}.wav")
-    import soundfile as sf
-    sf.write(filename, recording, sample_rate)
+    # The default input stays armed between takes, so recording starts without device setup
+    recorder = StreamingRecorder(filename, sample_rate=44100, channels=1, duration=seconds,
+                                 backend=get_registry().backend_for())
+    frames = recorder.record()
 
-    return filename, f"Recorded {seconds} seconds of audio"
+    return filename, f"Recorded {frames / recorder.sample_rate:.1f} seconds of audio"
 
 
 def process_audio_file(input_file, effect_preset=None):
@@ -128,12 +179,17 @@ def process_audio_file(input_file, effect_preset=None):
     if effect_preset and effect_preset != "None":
         apply_preset(effect_preset)
 
-    # Process the file
-    timestamp = int(time.time())
-    output_file = os.path.join(TEMP_DIR, f"processed_{timestamp}.wav")
     try:
+        effects = processor.get_effects()
+        key = render_key(input_file, effects, chunk_size=DEFAULT_CHUNK_FRAMES, streaming=False)
+        cached_file = render_cache.get(key)
+        if cached_file:
+            return cached_file, f"Processed with {len(effects)} effects (cached)"
+
+        # Process the file
+        output_file = os.path.join(TEMP_DIR, f"processed_{key}.wav")
         processor.process_file(input_file, output_file)
-        return output_file, f"Processed with {len(processor.get_effects())} effects"
+        return render_cache.put(key, output_file), f"Processed with {len(effects)} effects"
     except Exception as e:
         return None, f"Error processing file: {str(e)}"
 
@@ -151,6 +207,7 @@ def remove_effect(effect_index):
 
     try:
         index = int(effect_index)
+        forget_current_chain()
         removed = processor.remove_effect(index)
         if removed:
             return f"Removed {type(removed).__name__} from position {index}"
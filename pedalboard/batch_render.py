@@ -0,0 +1,124 @@
+# batch_render.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pedalboard import Pedalboard
+from pedalboard.io import AudioFile
+from effects_processor import EffectsProcessor, DEFAULT_CHUNK_FRAMES
+from effects_presets import get_effect_presets
+from render_cache import settings_key
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".aif", ".aiff", ".mp3", ".ogg")
+KEY_SUFFIX = ".render-key"  # Sidecar next to each output recording the chain and settings it was rendered with
+
+# One processor per worker process, built once by _init_worker
+_worker_processor = None
+_worker_tail_seconds = 0.0
+
+
+def find_audio_files(input_dir):
+    """Find audio files under input_dir, returned as paths relative to it"""
+    found = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return sorted(found)
+
+
+def output_path_for(relative_path, output_dir):
+    """Rendered files keep their relative path but are always written as WAV"""
+    return os.path.join(output_dir, os.path.splitext(relative_path)[0] + ".wav")
+
+
+def read_render_key(output_file):
+    try:
+        with open(output_file + KEY_SUFFIX) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_render_key(output_file, key):
+    with open(output_file + KEY_SUFFIX, "w") as f:
+        f.write(key + "\n")
+
+
+def is_up_to_date(input_file, output_file, key):
+    """Check if output_file is newer than input_file and was rendered with the same chain and settings"""
+    return (os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(input_file)
+            and read_render_key(output_file) == key)
+
+
+def _init_worker(preset_name, block_size, tail_seconds):
+    """Build this worker's effects chain once, before it renders any files"""
+    global _worker_processor, _worker_tail_seconds
+    _worker_processor = EffectsProcessor(block_size=block_size)
+    _worker_tail_seconds = tail_seconds
+    if preset_name:
+        _worker_processor.set_chain(get_effect_presets()[preset_name](), warm=False)
+
+
+def _render_one(input_file, output_file):
+    """Render one file in a worker. Returns (input_file, audio seconds, wall seconds)."""
+    with AudioFile(input_file) as f:
+        duration = f.frames / f.samplerate
+
+    started = time.perf_counter()
+    _worker_processor.process_file(input_file, output_file, tail_seconds=_worker_tail_seconds)
+    return input_file, duration, time.perf_counter() - started
+
+
+def render_batch(input_dir, output_dir, preset_name=None, workers=None, block_size=512, tail_seconds=0.0,
+                 force=False):
+    """Render every audio file in input_dir through a preset on a process pool
+
+    Files whose output is newer than the input and was rendered with the
+    same chain and settings are skipped unless force is set. Returns a
+    summary dict with counts and throughput.
+    """
+    workers = workers or os.cpu_count() or 1
+    chain = get_effect_presets()[preset_name]() if preset_name else Pedalboard([])
+    key = settings_key(chain, block_size=block_size, tail_seconds=tail_seconds, chunk_size=DEFAULT_CHUNK_FRAMES)
+    jobs = []
+    skipped = 0
+    for relative_path in find_audio_files(input_dir):
+        input_file = os.path.join(input_dir, relative_path)
+        output_file = output_path_for(relative_path, output_dir)
+        if not force and is_up_to_date(input_file, output_file, key):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        jobs.append((input_file, output_file))
+
+    print(f"Rendering {len(jobs)} files with {workers} workers ({skipped} up to date)")
+
+    audio_seconds = 0.0
+    failed = []
+    started = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(preset_name, block_size, tail_seconds)) as pool:
+            futures = {pool.submit(_render_one, *job): job for job in jobs}
+            for future in as_completed(futures):
+                input_file, output_file = futures[future]
+                try:
+                    _, duration, elapsed = future.result()
+                except Exception as e:
+                    failed.append(input_file)
+                    print(f"Failed {input_file}: {e}")
+                    continue
+                write_render_key(output_file, key)
+                audio_seconds += duration
+                speed = duration / elapsed if elapsed else 0.0
+                print(f"Rendered {input_file} ({duration:.1f}s audio, {speed:.1f}x real-time)")
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "rendered": len(jobs) - len(failed),
+        "skipped": skipped,
+        "failed": failed,
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall_seconds,
+        "realtime_multiple": audio_seconds / wall_seconds if wall_seconds else 0.0,
+    }
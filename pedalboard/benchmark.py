@@ -0,0 +1,168 @@
+# benchmark.py
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+from pedalboard import Pedalboard
+from effects_presets import get_effect_presets, get_individual_effects
+from streaming import StreamingUnsupportedError, measure_latency, process_block
+
+DEFAULT_BLOCK_SIZES = (64, 128, 256, 512, 1024, 2048, 4096)
+DEFAULT_SAMPLE_RATES = (44100, 48000)
+DEFAULT_DURATION = 10.0  # Seconds of test signal per grid point
+DEFAULT_THRESHOLD = 0.10  # Relative change that counts as a regression
+
+# Open-string frequencies of a guitar in standard tuning (E2 A2 D3 G3 B3 E4)
+GUITAR_NOTES_HZ = (82.41, 110.0, 146.83, 196.0, 246.94, 329.63)
+
+
+def synthesize_guitar(duration, sample_rate, seed=0):
+    """Synthesize a guitar-like test signal: plucked notes with decaying harmonics
+
+    Returns a float32 array shaped (frames, 1), the layout of the live path.
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(duration * sample_rate)
+    signal = np.zeros(frames, dtype=np.float32)
+    note_length = int(0.5 * sample_rate)
+    t = np.arange(note_length, dtype=np.float32) / sample_rate
+    for start in range(0, frames, note_length // 2):
+        freq = GUITAR_NOTES_HZ[rng.integers(len(GUITAR_NOTES_HZ))] * rng.choice((1, 2))
+        note = np.zeros(note_length, dtype=np.float32)
+        for harmonic in range(1, 9):
+            # Higher harmonics are quieter and die away faster
+            note += (np.sin(2 * np.pi * freq * harmonic * t) * np.exp(-t * 3.0 * harmonic)
+                     / harmonic).astype(np.float32)
+        # Short noise burst for the pick attack
+        attack = min(note_length, int(0.005 * sample_rate))
+        note[:attack] += rng.standard_normal(attack).astype(np.float32) * 0.3
+        end = min(frames, start + note_length)
+        signal[start:end] += note[:end - start]
+    signal *= 0.5 / max(1e-9, np.abs(signal).max())
+    return signal[:, np.newaxis]
+
+
+def get_benchmark_targets():
+    """Chain factories to benchmark: every preset and every individual effect"""
+    targets = {f"preset:{name}": factory for name, factory in get_effect_presets().items()}
+    for name, factory in get_individual_effects().items():
+        targets[f"effect:{name}"] = (lambda factory=factory: Pedalboard([factory()]))
+    return targets
+
+
+def benchmark_chain(chain, signal, sample_rate, block_size):
+    """Stream a signal through a chain block by block and measure it"""
+    num_blocks = signal.shape[0] // block_size
+    blocks = [np.ascontiguousarray(signal[i * block_size:(i + 1) * block_size]) for i in range(num_blocks)]
+
+    # Warm up (allocates plugin buffers) and start from a clean state
+    measure_latency(chain, sample_rate, block_size, signal.shape[1])
+
+    # Timing pass
+    times = np.empty(num_blocks)
+    for i, block in enumerate(blocks):
+        started = time.perf_counter()
+        process_block(chain, block, sample_rate, block_size)
+        times[i] = time.perf_counter() - started
+
+    # Allocation pass, separate because tracing slows everything down. Every
+    # result is kept until the second snapshot, so the traced memory blocks
+    # (array data and Python objects) each block leaves behind all show up
+    # in the count; temporaries freed inside the call do not.
+    chain.reset()
+    results = []
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for block in blocks:
+            results.append(process_block(chain, block, sample_rate, block_size))
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del results
+    chain.reset()
+    exclude = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    allocations = after.filter_traces(exclude).compare_to(before.filter_traces(exclude), "filename")
+
+    deadline = block_size / sample_rate
+    total = times.sum()
+    return {
+        "realtime_factor": (num_blocks * deadline) / total if total else float("inf"),
+        "p50_ms": 1000.0 * float(np.percentile(times, 50)),
+        "p99_ms": 1000.0 * float(np.percentile(times, 99)),
+        "max_ms": 1000.0 * float(times.max()),
+        "deadline_ms": 1000.0 * deadline,
+        "allocs_per_block": sum(stat.count_diff for stat in allocations) / num_blocks,
+        "alloc_bytes_per_block": sum(stat.size_diff for stat in allocations) / num_blocks,
+    }
+
+
+def run_benchmarks(block_sizes=DEFAULT_BLOCK_SIZES, sample_rates=DEFAULT_SAMPLE_RATES, duration=DEFAULT_DURATION,
+                   targets=None, progress=print):
+    """Benchmark every target over the block size / sample rate grid"""
+    factories = get_benchmark_targets()
+    if targets:
+        factories = {name: f for name, f in factories.items() if any(t.lower() in name.lower() for t in targets)}
+
+    results = []
+    for sample_rate in sample_rates:
+        signal = synthesize_guitar(duration, sample_rate)
+        for name, factory in factories.items():
+            for block_size in block_sizes:
+                point = {"target": name, "sample_rate": sample_rate, "block_size": block_size}
+                try:
+                    point.update(benchmark_chain(factory(), signal, sample_rate, block_size))
+                except StreamingUnsupportedError as e:
+                    # Timing a chain that streams silence would be meaningless
+                    if progress:
+                        progress(f"{name:<24} {sample_rate:>6} Hz {block_size:>5} skipped: {e}")
+                    continue
+                results.append(point)
+                if progress:
+                    progress(format_point(point))
+
+    return {
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration": duration,
+        "results": results,
+    }
+
+
+def format_point(point):
+    return (f"{point['target']:<24} {point['sample_rate']:>6} Hz {point['block_size']:>5} "
+            f"RTF {point['realtime_factor']:8.1f}x  p50 {point['p50_ms']:7.3f} ms  "
+            f"p99 {point['p99_ms']:7.3f} ms  allocs {point['allocs_per_block']:5.1f}/block "
+            f"({point['alloc_bytes_per_block'] / 1024:.1f} KiB)")
+
+
+def _point_key(point):
+    return point["target"], point["sample_rate"], point["block_size"]
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare two run_benchmarks() reports and list regressions beyond threshold"""
+    baseline_points = {_point_key(p): p for p in baseline["results"]}
+    regressions = []
+    for point in current["results"]:
+        old = baseline_points.get(_point_key(point))
+        if old is None:
+            continue
+        if point["realtime_factor"] < old["realtime_factor"] * (1 - threshold):
+            regressions.append((point, "realtime_factor", old["realtime_factor"], point["realtime_factor"]))
+        if point["p99_ms"] > old["p99_ms"] * (1 + threshold):
+            regressions.append((point, "p99_ms", old["p99_ms"], point["p99_ms"]))
+    return regressions
+
+
+def save_results(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
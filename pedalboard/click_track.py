@@ -0,0 +1,109 @@
+# click_track.py
+import numpy as np
+
+DEFAULT_BEATS_PER_BAR = 4
+DEFAULT_ACCENT = 1.0   # Level of the first beat of each bar
+DEFAULT_LEVEL = 0.6    # Level of the other beats
+CLICK_SECONDS = 0.03
+
+
+def synthesize_click(sample_rate, frequency=1000.0, duration=CLICK_SECONDS):
+    """A short, exponentially decaying sine blip"""
+    t = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+    return (np.sin(2 * np.pi * frequency * t) * np.exp(-t * 8.0 / duration)).astype(np.float32)
+
+
+def load_click(path, sample_rate=None):
+    """Read a click sample once, as mono float32. Returns (click, sample_rate)."""
+    import soundfile as sf
+    click, file_rate = sf.read(path, dtype='float32', always_2d=True)
+    click = click.mean(axis=1)
+    if sample_rate and sample_rate != file_rate:
+        # Linear resampling is plenty for a click
+        positions = np.arange(int(len(click) * sample_rate / file_rate)) * file_rate / sample_rate
+        click = np.interp(positions, np.arange(len(click)), click).astype(np.float32)
+        file_rate = sample_rate
+    return click, file_rate
+
+
+class ClickTrack:
+    """Sample-accurate metronome mixed into an output stream callback
+
+    Beats are scheduled by sample index on the stream's own clock, so the
+    click never drifts and needs no timer thread, disk access or extra
+    stream. Call mix_into(outdata) from an output callback once per block
+    (EffectsProcessor.add_output_mixer does this). Beat times accumulate
+    as floats and are rounded per beat, so any tempo stays exact over
+    long takes.
+
+    `accents` gives the level of each beat of the bar; beats at the
+    highest level use the accent click. Tempo and accent changes take
+    effect at the next beat.
+    """
+
+    def __init__(self, bpm, sample_rate=44100, beats_per_bar=DEFAULT_BEATS_PER_BAR, accents=None,
+                 click=None, accent_click=None, gain=1.0, start_frame=0):
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.click = synthesize_click(sample_rate) if click is None else np.asarray(click, dtype=np.float32)
+        if accent_click is None:
+            accent_click = synthesize_click(sample_rate, 1500.0) if click is None else self.click
+        self.accent_click = np.asarray(accent_click, dtype=np.float32)
+        self.bpm = bpm
+        self.accents = tuple(accents) if accents else (DEFAULT_ACCENT,) + (DEFAULT_LEVEL,) * (beats_per_bar - 1)
+        self._pending_bpm = None
+        self._pending_accents = None
+        self.frame = 0  # Stream frames mixed so far
+        self.beat = 0  # Beats started so far
+        self.beat_frames = []  # Stream frame of every beat started, for aligning recordings
+        self._next_beat = float(start_frame)
+        self._voices = []  # [sound, level, frames already played]
+
+    @property
+    def beats_per_bar(self):
+        return len(self.accents)
+
+    def set_tempo(self, bpm):
+        """Change the tempo from the next beat on"""
+        self._pending_bpm = bpm
+
+    def set_accents(self, accents):
+        """Change the accent pattern (levels per beat of the bar) from the next beat on"""
+        self._pending_accents = tuple(accents)
+
+    def beat_interval(self):
+        """Frames per beat at the current tempo"""
+        return 60.0 * self.sample_rate / self.bpm
+
+    def mix_into(self, outdata):
+        """Add the clicks that fall in this block to outdata, shaped (frames, channels)"""
+        frames = outdata.shape[0]
+        end = self.frame + frames
+
+        # Start every beat that falls in this block
+        while round(self._next_beat) < end:
+            start = round(self._next_beat)
+            if self._pending_accents:
+                self.accents, self._pending_accents = self._pending_accents, None
+            level = self.accents[self.beat % len(self.accents)]
+            sound = self.accent_click if level >= max(self.accents) else self.click
+            # A negative count means the click starts partway into this block
+            self._voices.append([sound, level * self.gain, self.frame - start])
+            self.beat_frames.append(start)
+            self.beat += 1
+            if self._pending_bpm:
+                self.bpm, self._pending_bpm = self._pending_bpm, None
+            self._next_beat += self.beat_interval()
+
+        # Mix every sounding click, including ones carried over from the last block
+        for voice in self._voices:
+            sound, level, played = voice
+            offset = max(0, -played)
+            start = max(0, played)
+            n = min(frames - offset, len(sound) - start)
+            if n > 0:
+                outdata[offset:offset + n] += level * sound[start:start + n, np.newaxis]
+            voice[2] = played + frames
+        if self._voices and self._voices[0][2] >= len(self._voices[0][0]):
+            self._voices = [v for v in self._voices if v[2] < len(v[0])]
+        self.frame = end
@@ -0,0 +1,267 @@
+# device_registry.py
+import re
+import threading
+from stream_backends import SoundDeviceBackend
+
+HOTPLUG_POLL_SECONDS = 2.0
+DEFAULT_ARM_BLOCK_SIZE = 1024  # Matches StreamingRecorder's default so its streams are reused
+
+
+def _hotplug_signature():
+    """Cheap fingerprint of the attached sound hardware, or None where there is none (non-Linux)"""
+    try:
+        with open("/proc/asound/cards") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class ArmedStream:
+    """An input stream that is opened and running before anyone needs it
+
+    Until a consumer attaches, blocks are only counted. attach() takes
+    effect at the next block boundary; that block's position in the stream
+    is stored in `start_frame`, so a take starts on a known sample instead
+    of after however long the device takes to open.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.stream = None
+        self.frames = 0  # Frames delivered since the stream was opened
+        self.start_frame = None  # Stream frame the current consumer started at
+        self._callback = None
+
+    @property
+    def in_use(self):
+        return self._callback is not None
+
+    def callback(self, indata, frames, time_info, status):
+        target = self._callback
+        if target is not None:
+            if self.start_frame is None:
+                self.start_frame = self.frames
+            target(indata, frames, time_info, status)
+        self.frames += frames
+
+    def attach(self, callback):
+        self.start_frame = None
+        self._callback = callback
+
+    def detach(self):
+        self._callback = None
+
+    def close(self):
+        self.detach()
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class ArmedStreamHandle:
+    """Returned by RegistryBackend.open_input. start/stop/close attach and
+    detach the consumer; the device stream itself stays open and running."""
+
+    def __init__(self, armed, callback):
+        self.armed = armed
+        self.callback = callback
+
+    @property
+    def start_frame(self):
+        return self.armed.start_frame
+
+    def start(self):
+        self.armed.attach(self.callback)
+
+    def stop(self):
+        self.armed.detach()
+
+    def close(self):
+        self.armed.detach()
+
+
+class DeviceRegistry:
+    """Cached device lookups and pre-opened input streams
+
+    Device lists and name lookups are queried once and cached until
+    refresh(), which also runs by itself on hotplug when watch_hotplug()
+    is active. arm_input() opens and starts an input stream ahead of time;
+    streams opened through backend_for() reuse it, so arming a take costs
+    a pointer swap instead of a PortAudio open.
+
+    `backend` opens the real streams (a SoundDeviceBackend by default, or
+    a VirtualDevice); `query` replaces sounddevice.query_devices.
+    """
+
+    def __init__(self, backend=None, query=None):
+        self.backend = backend or SoundDeviceBackend()
+        self._query = query
+        self._devices = None
+        self._lookups = {}
+        self._armed = {}
+        self._lock = threading.RLock()
+        self._signature = _hotplug_signature()
+        self._watch_stop = threading.Event()
+        self._watcher = None
+
+    # Device lookups
+
+    def devices(self):
+        """All devices, as returned by sounddevice.query_devices(), cached"""
+        with self._lock:
+            if self._devices is None:
+                if self._query:
+                    self._devices = list(self._query())
+                else:
+                    import sounddevice as sd
+                    self._devices = list(sd.query_devices())
+            return self._devices
+
+    def input_devices(self):
+        """(index, device) pairs for every device with input channels"""
+        return [(i, d) for i, d in enumerate(self.devices()) if d['max_input_channels'] > 0]
+
+    def find(self, pattern, kind="input"):
+        """Index of the first device whose name matches `pattern` (a case-insensitive
+        regular expression) and has `kind` ("input" or "output") channels, or None"""
+        key = (pattern, kind)
+        with self._lock:
+            if key not in self._lookups:
+                channels_key = f"max_{kind}_channels"
+                regex = re.compile(pattern, re.IGNORECASE)
+                self._lookups[key] = next((i for i, d in enumerate(self.devices())
+                                           if d[channels_key] > 0 and regex.search(d['name'])), None)
+            return self._lookups[key]
+
+    def resolve(self, device, kind="input"):
+        """Turn a device index, name pattern or None (system default) into an index or None"""
+        if device is None or isinstance(device, int):
+            return device
+        index = self.find(device, kind)
+        if index is None:
+            raise ValueError(f"No {kind} device matching '{device}'")
+        return index
+
+    def refresh(self, rescan=True):
+        """Forget cached lookups and re-query the devices
+
+        With `rescan` (and real sounddevice devices) PortAudio is
+        re-initialized so newly attached hardware shows up. That closes
+        every stream, so idle armed streams are closed first and re-armed
+        afterwards. Returns False, changing nothing, while an armed stream
+        is recording.
+        """
+        with self._lock:
+            if any(armed.in_use for armed in self._armed.values()):
+                return False
+            keys = list(self._armed)
+            for armed in self._armed.values():
+                armed.close()
+            self._armed.clear()
+            self._devices = None
+            self._lookups.clear()
+            if rescan and self._query is None and isinstance(self.backend, SoundDeviceBackend):
+                import sounddevice as sd
+                sd._terminate()
+                sd._initialize()
+            for device, channels, samplerate, blocksize in keys:
+                try:
+                    self.arm_input(device, channels, samplerate, blocksize)
+                except Exception as e:
+                    print(f"Could not re-arm input {device}: {e}")
+            return True
+
+    def watch_hotplug(self, interval=HOTPLUG_POLL_SECONDS):
+        """Refresh automatically when sound hardware is added or removed (Linux only)"""
+        if self._watcher or self._signature is None:
+            return
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name="device-hotplug")
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while not self._watch_stop.wait(interval):
+            signature = _hotplug_signature()
+            # A refresh that is refused mid-recording is retried on the next poll
+            if signature != self._signature and self.refresh():
+                self._signature = signature
+
+    # Armed streams
+
+    def arm_input(self, device=None, channels=1, samplerate=44100, blocksize=DEFAULT_ARM_BLOCK_SIZE):
+        """Open and start an input stream now so a later take can begin instantly
+
+        `device` is an index, a name pattern or None for the default input.
+        Returns the ArmedStream; arming the same configuration twice reuses it.
+        """
+        index = self.resolve(device, "input")
+        key = (index, channels, samplerate, blocksize)
+        with self._lock:
+            armed = self._armed.get(key)
+            if armed is None:
+                armed = ArmedStream(key)
+                armed.stream = self.backend.open_input(channels=channels, samplerate=samplerate,
+                                                       blocksize=blocksize, callback=armed.callback, device=index)
+                armed.stream.start()
+                self._armed[key] = armed
+            return armed
+
+    def backend_for(self, input_device=None, output_device=None):
+        """A stream backend whose inputs come from this registry's armed streams"""
+        return RegistryBackend(self, input_device, output_device)
+
+    def close(self):
+        """Stop watching for hotplug and close every armed stream"""
+        self._watch_stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=1.0)
+            self._watcher = None
+        with self._lock:
+            for armed in self._armed.values():
+                armed.close()
+            self._armed.clear()
+
+
+class RegistryBackend:
+    """Stream backend (see stream_backends) that serves inputs from armed streams
+
+    Devices can be given by index or name pattern. An input is armed on
+    first use and stays open after the consumer closes it. If the armed
+    stream is already busy a fresh one is opened instead.
+    """
+
+    def __init__(self, registry, input_device=None, output_device=None):
+        self.registry = registry
+        self.input_device = input_device
+        self.output_device = output_device
+
+    def open_input(self, channels, samplerate, blocksize, callback):
+        armed = self.registry.arm_input(self.input_device, channels, samplerate, blocksize)
+        if armed.in_use:
+            return self.registry.backend.open_input(channels=channels, samplerate=samplerate, blocksize=blocksize,
+                                                    callback=callback,
+                                                    device=self.registry.resolve(self.input_device, "input"))
+        return ArmedStreamHandle(armed, callback)
+
+    def open_output(self, channels, samplerate, blocksize, callback):
+        return self.registry.backend.open_output(channels=channels, samplerate=samplerate, blocksize=blocksize,
+                                                 callback=callback,
+                                                 device=self.registry.resolve(self.output_device, "output"))
+
+    def open_duplex(self, channels, samplerate, blocksize, callback):
+        device = (self.registry.resolve(self.input_device, "input"),
+                  self.registry.resolve(self.output_device, "output"))
+        return self.registry.backend.open_duplex(channels=channels, samplerate=samplerate, blocksize=blocksize,
+                                                 callback=callback, device=device)
+
+
+_registry = None
+
+
+def get_registry():
+    """The shared process-wide DeviceRegistry"""
+    global _registry
+    if _registry is None:
+        _registry = DeviceRegistry()
+    return _registry
@@ -0,0 +1,232 @@
+# effect_graph.py
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pedalboard import Pedalboard
+from render_cache import serialize_chain
+from iir_filter import FilterBank
+from streaming import clone_chain, measure_latency
+
+
+def _as_chain(chain):
+    if chain is None:
+        return Pedalboard([])
+    if isinstance(chain, (Pedalboard, EffectGraph, FilterBank)):
+        return chain
+    return Pedalboard(list(chain))
+
+
+class Branch:
+    """One parallel path of an EffectGraph: a chain and the gain it is merged at"""
+
+    def __init__(self, chain, gain=1.0, name=None):
+        self.chain = _as_chain(chain)
+        self.gain = gain
+        self.name = name
+
+
+class EffectGraph:
+    """Split/merge effect graph with parallel branches.
+
+    The input first goes through the optional `pre` chain and is then split
+    to every branch. Branches are processed concurrently on a thread pool
+    (pedalboard releases the GIL while processing), merged by their gains
+    into one preallocated buffer, scaled by `wet_gain`, mixed with
+    `dry_gain` of the split signal, and finally run through the optional
+    `post` chain.
+
+    A graph is called like a Pedalboard, so it can be published with
+    EffectsProcessor.set_chain() and streamed block by block. A branch's
+    chain (or pre/post) can itself be an EffectGraph or an
+    iir_filter.FilterBank.
+
+    When streaming (reset=False), each branch's latency is measured once
+    and the faster branches are delayed to match the slowest, so parallel
+    paths stay in phase instead of comb filtering when they are summed.
+    The delay lines and merge buffers are preallocated; the arrays the
+    sub-chains return are counted in `allocations` after every call.
+
+    Example: a clean DI blended with a distorted path, and a reverb send:
+
+        EffectGraph(
+            pre=[Compressor(threshold_db=-20, ratio=3)],
+            branches=[
+                Branch([], gain=0.5, name="clean"),
+                Branch([Distortion(drive_db=25), Gain(gain_db=-6)], gain=0.5, name="dirty"),
+                Branch([Reverb(room_size=0.8, wet_level=1.0, dry_level=0.0)], gain=0.3, name="reverb send"),
+            ],
+        )
+    """
+
+    def __init__(self, branches, pre=None, post=None, dry_gain=0.0, wet_gain=1.0, max_workers=None):
+        self.branches = [b if isinstance(b, Branch) else Branch(b) for b in branches]
+        self.pre = _as_chain(pre)
+        self.post = _as_chain(post)
+        self.dry_gain = dry_gain
+        self.wet_gain = wet_gain
+        self.max_workers = max_workers or len(self.branches)
+        self._pool = None
+        self._out = None  # Shared merge buffer, reallocated only if the block shape changes
+        self._scratch = None  # Gain-scaled branch output, same shape as the merge buffer
+        self._aligned_for = None  # (sample_rate, frames, channels) the branch delays were measured for
+        self.delays = [0] * len(self.branches)  # Frames each branch is delayed by while streaming
+        self._delay_lines = [None] * len(self.branches)  # Per branch: (circular line, output buffer)
+        self._delay_pos = [0] * len(self.branches)
+        self.allocations = 0  # Arrays allocated by the last call
+
+    def __len__(self):
+        return len(self.pre) + len(self.post) + sum(len(b.chain) for b in self.branches)
+
+    def __iter__(self):
+        """Iterate the sub-chains in signal order: pre, each branch, post"""
+        yield self.pre
+        for branch in self.branches:
+            yield branch.chain
+        yield self.post
+
+    def reset(self):
+        for chain in self:
+            chain.reset()
+        self._delay_lines = [None] * len(self.branches)
+        self._delay_pos = [0] * len(self.branches)
+
+    def describe(self):
+        """JSON-serializable description, used for cache keys"""
+        return {
+            "type": "EffectGraph",
+            "pre": serialize_chain(self.pre),
+            "branches": [{"name": b.name, "gain": b.gain, "chain": serialize_chain(b.chain)}
+                         for b in self.branches],
+            "dry_gain": self.dry_gain,
+            "wet_gain": self.wet_gain,
+            "post": serialize_chain(self.post),
+        }
+
+    def clone(self):
+        """A graph with the same structure and settings built from copies of every plugin"""
+        return EffectGraph([Branch(clone_chain(b.chain), b.gain, b.name) for b in self.branches],
+                           pre=clone_chain(self.pre), post=clone_chain(self.post), dry_gain=self.dry_gain,
+                           wet_gain=self.wet_gain, max_workers=self.max_workers)
+
+    def close(self):
+        """Shut down the branch thread pool"""
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    @staticmethod
+    def _run(chain, audio, sample_rate, buffer_size, reset):
+        """Run one sub-chain. Returns its output and the number of arrays allocated."""
+        if len(chain) == 0:
+            return audio, 0
+        out = chain(audio, sample_rate, buffer_size=buffer_size, reset=reset)
+        allocations = getattr(chain, "allocations", 1)
+        if out.shape != audio.shape:
+            # While streaming, a branch with latency returns short blocks; keep
+            # every branch the same length so they can be summed. Padding the
+            # axis that came back short works for either channel layout.
+            padded = np.zeros(audio.shape, dtype=np.float32)
+            padded[tuple(slice(n - m, None) for n, m in zip(audio.shape, out.shape))] = out
+            out = padded
+            allocations += 1
+        return out, allocations
+
+    @staticmethod
+    def _time_axis(audio):
+        return int(np.argmax(audio.shape)) if audio.ndim == 2 else 0
+
+    def _align(self, split, sample_rate):
+        """Measure every branch's streaming latency (once per block shape) and set the delays"""
+        axis = self._time_axis(split)
+        frames = split.shape[axis]
+        channels = split.shape[1 - axis] if split.ndim == 2 else 1
+        key = (sample_rate, frames, channels)
+        if key == self._aligned_for:
+            return
+        # Measuring resets the branches, so this only happens on the first block of a stream
+        latencies = [measure_latency(b.chain, sample_rate, frames, channels) for b in self.branches]
+        self.delays = [max(latencies) - latency for latency in latencies]
+        self._delay_lines = [None] * len(self.branches)
+        self._delay_pos = [0] * len(self.branches)
+        self._aligned_for = key
+
+    def _delay(self, index, out):
+        """Delay one branch's block by its alignment delay, carrying the overflow to the next block
+
+        The delay line is a circular buffer holding the last `delay` frames,
+        read and then overwritten in place, and the delayed block goes into
+        a buffer of the branch's own.
+        """
+        delay = self.delays[index]
+        if not delay:
+            return out
+        axis = self._time_axis(out)
+        n = out.shape[axis]
+        if self._delay_lines[index] is None or self._delay_lines[index][1].shape != out.shape:
+            shape = (delay,) + np.moveaxis(out, axis, 0).shape[1:]
+            self._delay_lines[index] = (np.zeros(shape, dtype=np.float32), np.empty(out.shape, dtype=np.float32))
+            self._delay_pos[index] = 0
+        line, result = self._delay_lines[index]
+        pos = self._delay_pos[index]
+        # Work with time as the first axis, whatever the channel layout
+        src = np.moveaxis(out, axis, 0)
+        dst = np.moveaxis(result, axis, 0)
+        if n >= delay:
+            # The whole line comes out first, oldest frame first, then the head of the block
+            dst[:delay - pos] = line[pos:]
+            dst[delay - pos:delay] = line[:pos]
+            dst[delay:] = src[:n - delay]
+            line[:] = src[n - delay:]
+            self._delay_pos[index] = 0
+        else:
+            # Read n frames from the line (wrapping at most once) and write the block in their place
+            first = min(n, delay - pos)
+            dst[:first] = line[pos:pos + first]
+            dst[first:] = line[:n - first]
+            line[pos:pos + first] = src[:first]
+            line[:n - first] = src[first:]
+            self._delay_pos[index] = (pos + n) % delay
+        return result
+
+    def process(self, audio, sample_rate, buffer_size=8192, reset=True):
+        """Process audio through the graph. The result is a view of a shared buffer."""
+        split, allocations = self._run(self.pre, audio, sample_rate, buffer_size, reset)
+        if not reset and len(self.branches) > 1:
+            self._align(split, sample_rate)
+
+        if len(self.branches) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="graph-branch")
+            futures = [self._pool.submit(self._run, b.chain, split, sample_rate, buffer_size, reset)
+                       for b in self.branches]
+            results = [future.result() for future in futures]
+        else:
+            results = [self._run(b.chain, split, sample_rate, buffer_size, reset) for b in self.branches]
+
+        # Merge into the shared buffer
+        if self._out is None or self._out.shape != split.shape:
+            self._out = np.zeros(split.shape, dtype=np.float32)
+            self._scratch = np.zeros(split.shape, dtype=np.float32)
+            allocations += 2
+        out = self._out
+        scratch = self._scratch
+        out.fill(0)
+        for index, (branch, (branch_out, branch_allocations)) in enumerate(zip(self.branches, results)):
+            allocations += branch_allocations
+            if not reset:
+                branch_out = self._delay(index, branch_out)
+            if branch.gain == 1.0:
+                out += branch_out
+            else:
+                np.multiply(branch_out, branch.gain, out=scratch)
+                out += scratch
+        if self.wet_gain != 1.0:
+            out *= self.wet_gain
+        if self.dry_gain:
+            np.multiply(split, self.dry_gain, out=scratch)
+            out += scratch
+
+        processed, post_allocations = self._run(self.post, out, sample_rate, buffer_size, reset)
+        self.allocations = allocations + post_allocations
+        return processed
+
+    __call__ = process
@@ -1,127 +1,508 @@
 # effects_processor.py
 import numpy as np
-import sounddevice as sd
-import queue
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pedalboard import Pedalboard, Plugin
 from pedalboard.io import AudioFile
 import os
+from ring_buffer import RingBuffer
+from telemetry import ProcessorStats
+from parameter_queue import ParameterQueue
+from effect_graph import EffectGraph
+from iir_filter import FilterBank
+from stream_backends import SoundDeviceBackend
+from streaming import StreamingChain, StreamingUnsupportedError, clone_chain, measure_latency, process_block_into
+
+
+PROCESSING_MODES = ("threaded", "duplex")
+
+# Frames read from disk per chunk by process_file
+DEFAULT_CHUNK_FRAMES = 65536
 
 
 class EffectsProcessor:
-    def __init__(self, sample_rate=44100, block_size=512, channels=1):
+    def __init__(self, sample_rate=44100, block_size=512, channels=1, queue_blocks=4, mode="threaded",
+                 streaming=True, param_ramp_blocks=4, param_ramp_curve="linear", output_channels=1,
+                 channel_workers=None, backend=None, realtime_policy=None):
+        if mode not in PROCESSING_MODES:
+            raise ValueError(f"mode must be one of {PROCESSING_MODES}")
         self.sample_rate = sample_rate
         self.block_size = block_size
         self.channels = channels
+        # Output channels (mono by default, which every interface has); input
+        # channels are summed into them round-robin
+        self.output_channels = output_channels
+        self.queue_blocks = queue_blocks
+        # "threaded": separate input/output streams bridged by a processing thread
+        # "duplex": one full-duplex stream running the chain inside its callback
+        self.mode = mode
+        # Keep plugin state (reverb/delay tails, pitch-shift buffers) across blocks
+        self.streaming = streaming
+        self.latency = None  # Chain latency in samples, measured on start()
+        # The published chain. It is never mutated while running: edits build a
+        # new Pedalboard and swap the reference, which the audio thread picks
+        # up at the next block boundary.
         self.effects_chain = Pedalboard([])
-        self.input_queue = queue.Queue()
-        self.output_queue = queue.Queue()
+        self._active_chain = self.effects_chain  # Chain the audio thread is running
+        self._swap_crossfade_blocks = 0
+        self._fade_from = None
+        self._fade_remaining = 0
+        self._fade_total = 0
+        # Replaced chains with resources to release (an EffectGraph's branch
+        # pool), closed once the audio thread no longer runs them
+        self._retired = []
+        # Optional per-input-channel chains, run concurrently before the main
+        # chain. Published as a whole tuple (None when no channel has one).
+        self.channel_chains = None
+        self.channel_workers = channel_workers or channels
+        self._channel_pool = None
+        # Preallocated hot-path buffers. Chains are fed C-contiguous float32
+        # blocks in pedalboard's channels-first layout and their results are
+        # copied into fixed (frames, channels) outputs, so the only per-block
+        # allocations left are the arrays the chain returns (counted in stats).
+        self._planar_in = np.zeros((channels, block_size), dtype=np.float32)
+        self._chain_out = np.zeros((block_size, channels), dtype=np.float32)
+        self._fade_out = np.zeros((block_size, channels), dtype=np.float32)
+        self._fade_steps = (np.arange(block_size, dtype=np.float32) / block_size)[:, np.newaxis]
+        self._fade_ramp = np.zeros((block_size, 1), dtype=np.float32)
+        self._channel_out = np.zeros((block_size, channels), dtype=np.float32)
+        self._mix_out = np.zeros((block_size, self.output_channels), dtype=np.float32)
+        # Parameter changes are applied on the audio thread at block boundaries
+        self.param_queue = ParameterQueue(param_ramp_blocks, param_ramp_curve)
+        # Fixed-size rings bound the latency to queue_blocks blocks per direction
+        self.input_ring = RingBuffer(queue_blocks, block_size, channels)
+        self.output_ring = RingBuffer(queue_blocks, block_size, self.output_channels)
+        self.stats = ProcessorStats(block_size, sample_rate)
+        # Where streams come from: real devices, or a VirtualDevice for headless testing
+        self.backend = backend or SoundDeviceBackend()
+        # Objects with mix_into(outdata), e.g. a click_track.ClickTrack, added to
+        # every output block on the audio clock. Published as a whole tuple.
+        self.output_mixers = ()
+        # Optional rt_scheduling.RealtimePolicy: priority, CPU pinning and GC control
+        self.realtime_policy = realtime_policy
         self.is_running = False
         self.input_stream = None
         self.output_stream = None
+        self.duplex_stream = None
         self.processing_thread = None
 
+    def set_chain(self, chain, crossfade_blocks=0, warm=True, latency=None):
+        """Replace the whole effects chain with a single atomic swap
+
+        The new chain should be freshly built (not sharing plugins with the
+        running one). It is warmed up here, on the caller's thread, and then
+        published with one reference assignment that the audio thread picks
+        up at the next block boundary. With crossfade_blocks > 0 both chains
+        run for that many blocks while the output crossfades between them.
+        Chains that are already warm (e.g. from a PresetPool) can skip the
+        warm-up by passing warm=False and their known latency. An
+        EffectGraph or FilterBank can be published the same way. When
+        streaming, the warm-up raises StreamingUnsupportedError for chains
+        that cannot be streamed, before anything is published.
+        """
+        if not isinstance(chain, (Pedalboard, EffectGraph, FilterBank)):
+            chain = Pedalboard(list(chain))
+        if isinstance(chain, Pedalboard):
+            for effect in chain:
+                if not isinstance(effect, Plugin):
+                    raise TypeError("Effect must be a pedalboard Plugin")
+
+        if warm:
+            # Running the latency probe allocates the plugins' internal
+            # buffers and leaves them reset, so the first live block is cheap
+            latency = measure_latency(chain, self.sample_rate, self.block_size, self.channels,
+                                      check=self.streaming)
+
+        self._publish(chain, crossfade_blocks)
+        self.latency = latency
+
+    def _publish(self, chain, crossfade_blocks=0):
+        """Swap in a new chain reference for the audio thread"""
+        previous = self.effects_chain
+        self._swap_crossfade_blocks = crossfade_blocks
+        self.effects_chain = chain
+        if not self.is_running:
+            self._active_chain = chain
+        if previous is not chain and hasattr(previous, "close"):
+            self._retired.append(previous)
+        self._close_retired()
+
+    def _close_retired(self):
+        """Close replaced chains that are neither running nor part of the current chain"""
+        def contains(chain, target):
+            return chain is target or (isinstance(chain, EffectGraph) and any(contains(c, target) for c in chain))
+
+        still_used = []
+        for chain in self._retired:
+            if self.is_chain_in_use(chain) or contains(self.effects_chain, chain):
+                still_used.append(chain)
+            else:
+                chain.close()
+        self._retired = still_used
+
+    def set_channel_chain(self, channel, chain, warm=True):
+        """Assign a chain to one input channel (None to pass it through dry)
+
+        Each channel chain processes that channel alone, so chains for
+        different instruments run concurrently on a thread pool (pedalboard
+        releases the GIL while processing). The result then goes through the
+        main effects chain as usual.
+        """
+        if not 0 <= channel < self.channels:
+            raise IndexError(f"Channel {channel} out of range for {self.channels} channels")
+        if chain is not None:
+            if not isinstance(chain, Pedalboard):
+                chain = Pedalboard(list(chain))
+            if warm:
+                measure_latency(chain, self.sample_rate, self.block_size, 1, check=self.streaming)
+        chains = list(self.channel_chains or (None,) * self.channels)
+        chains[channel] = chain
+        # Copy on write, picked up by the audio thread at the next block
+        self.channel_chains = tuple(chains) if any(c is not None for c in chains) else None
+
+    def add_output_mixer(self, mixer):
+        """Mix `mixer` (anything with mix_into(outdata)) into every output block"""
+        self.output_mixers = self.output_mixers + (mixer,)
+
+    def remove_output_mixer(self, mixer):
+        self.output_mixers = tuple(m for m in self.output_mixers if m is not mixer)
+
+    def is_chain_in_use(self, chain):
+        """Check if the audio thread may still be running `chain` (published or fading out)"""
+        return chain is self.effects_chain or chain is self._active_chain or chain is self._fade_from
+
+    def _check_editable(self):
+        if not isinstance(self.effects_chain, Pedalboard):
+            raise TypeError(f"A {type(self.effects_chain).__name__} cannot be edited in place; "
+                            "build a new one and use set_chain")
+
     def add_effect(self, effect):
-        """Add an effect to the chain"""
+        """Add an effect to the chain
+
+        Like every chain change, this builds a new chain and publishes it
+        through set_chain(), so it is warmed up and checked first. Raises
+        StreamingUnsupportedError, leaving the chain unchanged, if the
+        result cannot be streamed.
+        """
+        self._check_editable()
         if isinstance(effect, Plugin):
-            self.effects_chain.append(effect)
+            self.set_chain(self._editable_effects() + [effect])
             return len(self.effects_chain) - 1  # Return the index of the added effect
         else:
             raise TypeError("Effect must be a pedalboard Plugin")
 
     def remove_effect(self, index):
         """Remove an effect from the chain by index"""
+        self._check_editable()
         if 0 <= index < len(self.effects_chain):
-            removed = self.effects_chain.pop(index)
+            removed = self.effects_chain[index]
+            effects = self._editable_effects()
+            effects.pop(index)
+            self.set_chain(effects)
             return removed
         return None
 
+    def _editable_effects(self):
+        """The current plugins as a list to build the next chain from
+
+        While running, the audio thread owns the published plugins, and
+        warming the new chain would reset them mid-stream, so the list holds
+        copies of them instead.
+        """
+        if self.is_running:
+            return list(clone_chain(self.effects_chain))
+        return list(self.effects_chain)
+
     def clear_effects(self):
         """Remove all effects"""
-        self.effects_chain.clear()
+        self._publish(Pedalboard([]))
+        self.latency = None
 
     def get_effects(self):
         """Get the current list of effects"""
         return self.effects_chain
 
-    def update_effect_parameter(self, index, parameter_name, value):
-        """Update a parameter of an effect by index"""
+    def get_latency(self):
+        """Get the chain's streaming latency in samples.
+
+        Measuring resets plugin state, so while running this returns the
+        value measured on start() (None if the chain has changed since).
+        Raises StreamingUnsupportedError if the chain cannot be streamed.
+        """
+        if self.latency is None and not self.is_running:
+            self.latency = measure_latency(
+                self.effects_chain, self.sample_rate, self.block_size, self.channels, check=self.streaming)
+        return self.latency
+
+    def update_effect_parameter(self, index, parameter_name, value, ramp_blocks=None, curve=None):
+        """Update a parameter of an effect by index
+
+        While running, the change is queued and applied by the audio thread
+        at the next block boundary, ramped over ramp_blocks blocks
+        (default param_ramp_blocks) to avoid zipper noise. The value is
+        first tried on a scratch instance of the plugin, so an out-of-range
+        value raises ValueError here rather than on the audio thread.
+        """
+        if not isinstance(self.effects_chain, Pedalboard):
+            return False
         if 0 <= index < len(self.effects_chain):
-            if hasattr(self.effects_chain[index], parameter_name):
-                setattr(self.effects_chain[index], parameter_name, value)
+            effect = self.effects_chain[index]
+            if hasattr(effect, parameter_name):
+                if self.is_running:
+                    self._validate_parameter(effect, parameter_name, value)
+                    self.param_queue.push(effect, parameter_name, value, ramp_blocks, curve)
+                else:
+                    setattr(effect, parameter_name, value)
                 return True
         return False
 
+    @staticmethod
+    def _validate_parameter(effect, parameter_name, value):
+        """Raise if the plugin would reject the value, without touching the running plugin"""
+        try:
+            scratch = type(effect)()
+        except TypeError:
+            return  # Needs constructor arguments (e.g. a plugin file); apply_pending drops a bad value
+        setattr(scratch, parameter_name, value)
+
     def input_callback(self, indata, frames, time, status):
         """Callback for audio input"""
         if status:
-            print(f"Input status: {status}")
-        # Put input data into the queue
-        self.input_queue.put(indata.copy())
+            self.stats.record_status(status)
+        # Copy input data into the ring; if it is full the block is dropped
+        if not self.input_ring.write(indata):
+            self.stats.count("input_dropped")
+        self.stats.record_occupancy("input", len(self.input_ring))
 
     def output_callback(self, outdata, frames, time, status):
         """Callback for audio output"""
         if status:
-            print(f"Output status: {status}")
+            self.stats.record_status(status)
 
-        try:
-            # Get processed data from the queue
-            outdata[:] = self.output_queue.get_nowait()
-        except queue.Empty:
+        self.stats.record_occupancy("output", len(self.output_ring))
+        # Get processed data from the ring
+        if not self.output_ring.read_into(outdata):
             # If no data is available, output silence
             outdata.fill(0)
+            self.stats.count("zero_filled")
+        for mixer in self.output_mixers:
+            mixer.mix_into(outdata)
+
+    def duplex_callback(self, indata, outdata, frames, time, status):
+        """Callback for the full-duplex stream: process the block in place"""
+        if status:
+            self.stats.record_status(status)
+
+        outdata[:] = self.process_block(indata)
+        for mixer in self.output_mixers:
+            mixer.mix_into(outdata)
+
+    def process_block(self, indata):
+        """Run one block through the effects chain"""
+        started = time.perf_counter()
+
+        # Apply queued parameter changes and advance any ramps
+        rejected = self.param_queue.apply_pending()
+        if rejected:
+            self.stats.count("param_errors", rejected)
+
+        # Read the published chain once per block; a swap takes effect here
+        chain = self.effects_chain
+        if chain is not self._active_chain:
+            if self._swap_crossfade_blocks > 0:
+                self._fade_from = self._active_chain
+                self._fade_remaining = self._fade_total = self._swap_crossfade_blocks
+            else:
+                self._fade_from = None
+            self._active_chain = chain
+
+        planar = self._planar_in
+        np.copyto(planar, indata.T)
+
+        allocations = 0
+        channel_chains = self.channel_chains
+        if channel_chains is not None:
+            allocations += self._process_channels(channel_chains, planar)
+            np.copyto(planar, self._channel_out.T)
+
+        processed = self._chain_out
+        allocations += self._run_chain(chain, planar, processed)
+        if self._fade_from is not None:
+            allocations += self._run_chain(self._fade_from, planar, self._fade_out)
+            self._crossfade(self._fade_out, processed)
+
+        if self.output_channels != self.channels:
+            processed = self._mix_down(processed)
+
+        if allocations:
+            self.stats.count("allocations", allocations)
+        self.stats.record_processing_time(time.perf_counter() - started)
+        return processed
+
+    def _finish_parameter_changes(self):
+        """Run queued changes and ramps to their final values once the stream is stopped"""
+        while self.param_queue.pending():
+            self.param_queue.apply_pending()
+
+    def _process_channels(self, channel_chains, planar):
+        """Run each channel through its own chain concurrently into the channel buffer
+
+        Returns the number of arrays allocated.
+        """
+        out = self._channel_out
+        allocations = 0
+        pending = []
+        for channel, chain in enumerate(channel_chains):
+            row = planar[channel:channel + 1]
+            column = out[:, channel:channel + 1]
+            if chain is None:
+                np.copyto(column, row.T)
+            elif self._channel_pool is None:
+                allocations += self._run_chain(chain, row, column)
+            else:
+                pending.append(self._channel_pool.submit(self._run_chain, chain, row, column))
+        # Every channel must be finished before the block is handed to the output
+        for future in pending:
+            allocations += future.result()
+        return allocations
+
+    def _mix_down(self, processed):
+        """Sum input channels into the output channels round-robin"""
+        out = self._mix_out
+        out.fill(0)
+        for channel in range(processed.shape[1]):
+            out[:, channel % self.output_channels] += processed[:, channel]
+        return out
+
+    def _run_chain(self, chain, planar, out):
+        """Run a channels-first block through a chain into `out`. Returns the number of arrays allocated."""
+        if self.streaming:
+            return process_block_into(chain, planar, out, self.sample_rate, self.block_size)
+        if len(chain) == 0:
+            np.copyto(out, planar.T)
+            return 0
+        np.copyto(out, chain(planar, self.sample_rate).T)
+        return getattr(chain, "allocations", 1)
+
+    def _crossfade(self, old, new):
+        """Mix one block of an in-progress chain crossfade into `new`, in place"""
+        # Linear ramp spanning the whole fade, evaluated over this block
+        ramp = self._fade_ramp
+        np.add(self._fade_steps, self._fade_total - self._fade_remaining, out=ramp)
+        ramp /= self._fade_total
+        # new = old + (new - old) * ramp
+        new -= old
+        new *= ramp
+        new += old
+        self._fade_remaining -= 1
+        if self._fade_remaining <= 0:
+            self._fade_from = None
+
+    def get_stats(self):
+        """Get a snapshot of the real-time counters, ring occupancy and timing histogram"""
+        return self.stats.snapshot()
 
     def process_audio(self):
-        """Process audio from input to output queue"""
+        """Process audio from input to output ring"""
+        policy = self.realtime_policy
+        if policy:
+            policy.apply_to_current_thread()
+
+        # Poll a few times per block while waiting for input
+        idle_sleep = self.block_size / self.sample_rate / 4
         while self.is_running:
-            try:
-                # Get input data
-                indata = self.input_queue.get(timeout=1.0)
+            # Get a view of the next input block
+            indata = self.input_ring.peek()
+            if indata is None:
+                if policy:
+                    # Nothing to process: a good moment for housekeeping like GC
+                    policy.idle()
+                time.sleep(idle_sleep)
+                continue
 
-                # Process the audio through the effects chain
-                if len(self.effects_chain) > 0:
-                    processed = self.effects_chain(indata, self.sample_rate)
-                else:
-                    processed = indata
+            # Process the audio through the effects chain
+            processed = self.process_block(indata)
 
-                # Put processed data into the output queue
-                self.output_queue.put(processed)
-            except queue.Empty:
-                continue
+            # Put processed data into the output ring; if the output side
+            # has fallen behind the block is dropped to keep latency bounded
+            if not self.output_ring.write(processed):
+                self.stats.count("output_dropped")
+            self.input_ring.advance()
 
     def start(self):
         """Start audio processing"""
         if self.is_running:
             return
 
+        if self.streaming:
+            # Measuring the latency also leaves every plugin freshly reset, and
+            # refuses chains that would stream silence or gaps
+            latency = self.get_latency()
+            print(f"Chain latency: {latency} samples ({1000.0 * latency / self.sample_rate:.1f} ms)")
+
+        # Open the streams before anything runs, so a backend that refuses
+        # one leaves nothing behind
+        if self.mode == "duplex":
+            # Input and output share one stream, and therefore one clock
+            self.duplex_stream = self.backend.open_duplex(
+                channels=(self.channels, self.output_channels),
+                samplerate=self.sample_rate,
+                blocksize=self.block_size,
+                callback=self.duplex_callback
+            )
+        else:
+            self.input_stream = self.backend.open_input(
+                channels=self.channels,
+                samplerate=self.sample_rate,
+                blocksize=self.block_size,
+                callback=self.input_callback
+            )
+            try:
+                self.output_stream = self.backend.open_output(
+                    channels=self.output_channels,
+                    samplerate=self.sample_rate,
+                    blocksize=self.block_size,
+                    callback=self.output_callback
+                )
+            except Exception:
+                self.input_stream.close()
+                self.input_stream = None
+                raise
+
+        self.stats.reset()
+        self._active_chain = self.effects_chain
+        self._fade_from = None
+        if self.channels > 1:
+            self._channel_pool = ThreadPoolExecutor(max_workers=self.channel_workers,
+                                                    thread_name_prefix="channel-chain")
         self.is_running = True
 
+        if self.realtime_policy:
+            # In duplex mode there is no processing thread to collect in idle gaps
+            self.realtime_policy.start(background_gc=self.mode == "duplex")
+
+        if self.mode == "duplex":
+            self.duplex_stream.start()
+            print("Audio processing started (duplex)")
+            if self.realtime_policy:
+                # PortAudio owns the callback thread; only GC control applies here
+                print(self.realtime_policy.report())
+            return
+
         # Start the processing thread
-        self.processing_thread = threading.Thread(target=self.process_audio)
+        self.processing_thread = threading.Thread(target=self.process_audio, name="effects-processing")
         self.processing_thread.daemon = True
         self.processing_thread.start()
 
-        # Start audio input stream
-        self.input_stream = sd.InputStream(
-            channels=self.channels,
-            samplerate=self.sample_rate,
-            blocksize=self.block_size,
-            callback=self.input_callback
-        )
-
-        # Start audio output stream
-        self.output_stream = sd.OutputStream(
-            channels=self.channels,
-            samplerate=self.sample_rate,
-            blocksize=self.block_size,
-            callback=self.output_callback
-        )
-
         self.input_stream.start()
         self.output_stream.start()
 
         print("Audio processing started")
+        if self.realtime_policy:
+            # Give the processing thread a moment to apply its own settings
+            time.sleep(0.05)
+            print(self.realtime_policy.report())
 
     def stop(self):
         """Stop audio processing"""
@@ -135,6 +516,11 @@ class EffectsProcessor:
             self.processing_thread.join(timeout=1.0)
 
         # Stop audio streams
+        if self.duplex_stream:
+            self.duplex_stream.stop()
+            self.duplex_stream.close()
+            self.duplex_stream = None
+
         if self.input_stream:
             self.input_stream.stop()
             self.input_stream.close()
@@ -145,30 +531,115 @@ class EffectsProcessor:
             self.output_stream.close()
             self.output_stream = None
 
-        # Clear queues
-        while not self.input_queue.empty():
-            self.input_queue.get_nowait()
+        if self._channel_pool:
+            self._channel_pool.shutdown(wait=True)
+            self._channel_pool = None
+
+        if self.realtime_policy:
+            self.realtime_policy.stop()
+
+        self._fade_from = None
+        self._active_chain = self.effects_chain
+        self._close_retired()
+
+        # Apply whatever parameter changes were still queued or ramping
+        self._finish_parameter_changes()
 
-        while not self.output_queue.empty():
-            self.output_queue.get_nowait()
+        # Clear rings
+        self.input_ring.clear()
+        self.output_ring.clear()
 
         print("Audio processing stopped")
 
-    def process_file(self, input_file, output_file):
-        """Process an audio file through the current effects chain"""
+    def process_file(self, input_file, output_file, streaming=False, compensate_latency=True, tail_seconds=0.0,
+                     chunk_size=DEFAULT_CHUNK_FRAMES, progress_callback=None, bit_depth=16):
+        """Render an audio file through the current chain in constant memory, chunk_size frames at a time
+
+        streaming=True feeds block_size blocks exactly like the live path.
+        progress_callback(frames_done, total_frames, frames_per_second) runs after every chunk.
+        The render uses its own copy of the chain, so it never resets or
+        probes the chain the audio thread may be running.
+        """
         # Make sure output directory exists
         os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
 
-        # Read input audio file
+        source = clone_chain(self.effects_chain)
+        try:
+            return self._render_file(source, input_file, output_file, streaming, compensate_latency, tail_seconds,
+                                     chunk_size, progress_callback, bit_depth)
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+    def _render_file(self, source, input_file, output_file, streaming, compensate_latency, tail_seconds, chunk_size,
+                     progress_callback, bit_depth):
+        """Render input_file through `source`, a chain no other thread is using"""
         with AudioFile(input_file) as f:
-            audio = f.read(f.frames)
             samplerate = f.samplerate
+            num_channels = f.num_channels
+            total_frames = f.frames
 
-        # Process audio through effects chain
-        processed = self.effects_chain(audio, samplerate)
+            block_size = self.block_size if streaming else chunk_size
+            # Whole blocks per chunk so block boundaries match the live path
+            chunk_size = max(block_size, chunk_size // block_size * block_size)
 
-        # Write processed audio to output file
-        with AudioFile(output_file, 'w', samplerate, processed.shape[0]) as f:
-            f.write(processed)
-
-        return output_file
\ No newline at end of file
+            try:
+                chain = StreamingChain(source, samplerate, block_size, num_channels,
+                                       compensate_latency=compensate_latency)
+            except StreamingUnsupportedError as e:
+                print(f"{e}. Rendering {input_file} in one pass instead.")
+                return self._render_whole(source, f, output_file, tail_seconds, progress_callback, bit_depth)
+            chain.reset()
+
+            # Blocks are laid out (frames, channels) like the live callbacks
+            block = np.zeros((block_size, num_channels), dtype=np.float32)
+            # Output stops at the input length plus the requested tail
+            remaining = total_frames + int(round(tail_seconds * samplerate))
+            frames_done = 0
+            started = time.perf_counter()
+
+            with AudioFile(output_file, 'w', samplerate, num_channels, bit_depth=bit_depth) as out:
+                def write(processed):
+                    nonlocal remaining
+                    processed = processed[:remaining]
+                    if processed.shape[0]:
+                        out.write(np.ascontiguousarray(processed.T))
+                        remaining -= processed.shape[0]
+
+                while f.tell() < total_frames:
+                    chunk = f.read(chunk_size)  # (channels, frames)
+                    if chunk.shape[1] == 0:
+                        break
+                    for start in range(0, chunk.shape[1], block_size):
+                        frames = min(block_size, chunk.shape[1] - start)
+                        block[:frames] = chunk[:, start:start + frames].T
+                        block[frames:] = 0
+                        write(chain.process(block))
+                    frames_done += chunk.shape[1]
+
+                    if progress_callback:
+                        elapsed = time.perf_counter() - started
+                        progress_callback(frames_done, total_frames, frames_done / elapsed if elapsed else 0.0)
+
+                # Flush latency and effect tails
+                for processed in chain.flush(tail_seconds):
+                    write(processed)
+
+            chain.reset()
+
+        return output_file
+
+    def _render_whole(self, chain, f, output_file, tail_seconds, progress_callback, bit_depth):
+        """Render an open file with one reset=True call, for chains that cannot be streamed"""
+        started = time.perf_counter()
+        audio = f.read(f.frames)
+        tail = int(round(tail_seconds * f.samplerate))
+        if tail:
+            audio = np.concatenate([audio, np.zeros((audio.shape[0], tail), dtype=np.float32)], axis=1)
+        processed = chain(audio, f.samplerate)
+        with AudioFile(output_file, 'w', f.samplerate, f.num_channels, bit_depth=bit_depth) as out:
+            out.write(processed)
+        if progress_callback:
+            elapsed = time.perf_counter() - started
+            progress_callback(f.frames, f.frames, f.frames / elapsed if elapsed else 0.0)
+        return output_file
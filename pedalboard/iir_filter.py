@@ -0,0 +1,163 @@
+# iir_filter.py
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+
+FILTER_TYPES = ("highpass", "lowpass", "bandpass", "bandstop", "lowshelf", "highshelf", "peak")
+BUTTERWORTH_TYPES = ("highpass", "lowpass", "bandpass", "bandstop")
+
+
+def _rbj_biquad(kind, frequency, sample_rate, gain_db, q):
+    """One shelf or peaking section from the RBJ Audio EQ Cookbook, as an SOS row"""
+    a = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * frequency / sample_rate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+    shelf = 2 * np.sqrt(a) * alpha
+    if kind == "lowshelf":
+        b = (a * ((a + 1) - (a - 1) * cos_w0 + shelf), 2 * a * ((a - 1) - (a + 1) * cos_w0),
+             a * ((a + 1) - (a - 1) * cos_w0 - shelf))
+        den = ((a + 1) + (a - 1) * cos_w0 + shelf, -2 * ((a - 1) + (a + 1) * cos_w0),
+               (a + 1) + (a - 1) * cos_w0 - shelf)
+    elif kind == "highshelf":
+        b = (a * ((a + 1) + (a - 1) * cos_w0 + shelf), -2 * a * ((a - 1) + (a + 1) * cos_w0),
+             a * ((a + 1) + (a - 1) * cos_w0 - shelf))
+        den = ((a + 1) - (a - 1) * cos_w0 + shelf, 2 * ((a - 1) - (a + 1) * cos_w0),
+               (a + 1) - (a - 1) * cos_w0 - shelf)
+    else:  # peak
+        b = (1 + alpha * a, -2 * cos_w0, 1 - alpha * a)
+        den = (1 + alpha / a, -2 * cos_w0, 1 - alpha / a)
+    return np.array(b + den) / den[0]
+
+
+@lru_cache(maxsize=256)
+def design_sos(kind, cutoff, sample_rate, order=2, gain_db=0.0, q=0.7071):
+    """Second-order sections for one filter, cached by its full specification
+
+    `cutoff` is in Hz, or a (low, high) tuple for bandpass/bandstop. The
+    pass/stop types are Butterworth designs; shelves and peaks are single
+    RBJ biquads (order is ignored). The result is shared between callers
+    and therefore read-only.
+    """
+    if kind in BUTTERWORTH_TYPES:
+        sos = signal.butter(order, cutoff, btype=kind, fs=sample_rate, output="sos")
+    elif kind in FILTER_TYPES:
+        sos = _rbj_biquad(kind, cutoff, sample_rate, gain_db, q)[np.newaxis]
+    else:
+        raise ValueError(f"kind must be one of {FILTER_TYPES}")
+    sos.setflags(write=False)
+    return sos
+
+
+class IIRFilter:
+    """One filter of a FilterBank. Attributes may be changed; the bank redesigns on the next block."""
+
+    def __init__(self, kind, cutoff, order=2, gain_db=0.0, q=0.7071):
+        if kind not in FILTER_TYPES:
+            raise ValueError(f"kind must be one of {FILTER_TYPES}")
+        self.kind = kind
+        self.cutoff = tuple(cutoff) if isinstance(cutoff, (list, tuple)) else cutoff
+        self.order = order
+        self.gain_db = gain_db
+        self.q = q
+
+    def key(self):
+        return self.kind, self.cutoff, self.order, self.gain_db, self.q
+
+    def sos(self, sample_rate):
+        return design_sos(self.kind, self.cutoff, sample_rate, self.order, self.gain_db, self.q)
+
+    def describe(self):
+        return {"kind": self.kind, "cutoff": self.cutoff, "order": self.order, "gain_db": self.gain_db, "q": self.q}
+
+
+class FilterBank:
+    """Cascade of IIR filters run as one stateful, vectorized sosfilt
+
+    The sections of every filter are stacked into a single SOS array, so
+    all filters and all channels are processed by one sosfilt call. The
+    filter state (zi) is carried from block to block, so streaming block
+    by block gives exactly the same result as filtering in one go.
+
+    A bank is called like a Pedalboard: it can be published with
+    EffectsProcessor.set_chain(), used as an EffectGraph's pre/post chain
+    or branch, and run offline by audio_pipeline.Filter. Audio may be 1-D,
+    (frames, channels) or (channels, frames); the longer axis is time.
+
+    sosfilt has no output argument, so every call returns new arrays; how
+    many is kept in `allocations` for the live path's accounting.
+    """
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+        self._key = None
+        self._sos = None
+        self._zi = None
+        self.allocations = 0  # Arrays allocated by the last call
+
+    def __len__(self):
+        return len(self.filters)
+
+    def __iter__(self):
+        return iter(self.filters)
+
+    def reset(self):
+        self._zi = None
+
+    def describe(self):
+        """JSON-serializable description, used for cache keys"""
+        return {"type": "FilterBank", "filters": [f.describe() for f in self.filters]}
+
+    def clone(self):
+        """A bank with the same filters and fresh state"""
+        return FilterBank(IIRFilter(**f.describe()) for f in self.filters)
+
+    def sections(self, sample_rate):
+        """The stacked SOS array for this sample rate, rebuilt only when a filter changes"""
+        key = (sample_rate,) + tuple(f.key() for f in self.filters)
+        if key != self._key:
+            sos = np.concatenate([f.sos(sample_rate) for f in self.filters])
+            if self._sos is None or sos.shape != self._sos.shape:
+                self._zi = None  # State does not carry over to a different structure
+            self._key, self._sos = key, sos
+        return self._sos
+
+    def _is_channels_last(self, audio):
+        channels = None if self._zi is None else self._zi.shape[1]
+        if channels is not None and audio.shape[0] != audio.shape[1]:
+            # While streaming, the channel count breaks ties such as a 1-frame stereo block
+            if audio.shape[1] == channels:
+                return True
+            if audio.shape[0] == channels:
+                return False
+        return audio.shape[0] > audio.shape[1]
+
+    def process(self, audio, sample_rate, buffer_size=None, reset=True):
+        """Filter audio. With reset=False the state from the previous call carries over."""
+        if not self.filters:
+            self.allocations = 0
+            return audio
+        sos = self.sections(sample_rate)
+        if reset:
+            self._zi = None
+
+        x = audio if audio.ndim == 2 else audio[np.newaxis]
+        channels_last = self._is_channels_last(x)
+        planar = x.T if channels_last else x
+        # sosfilt returns the output and the new state; the float32 copy is a third
+        allocations = 3
+        if self._zi is None or self._zi.shape[1] != planar.shape[0]:
+            self._zi = np.zeros((sos.shape[0], planar.shape[0], 2))
+            allocations += 1
+
+        out, self._zi = signal.sosfilt(sos, planar, axis=-1, zi=self._zi)
+        out = out.astype(np.float32)
+        if channels_last:
+            out = out.T
+            if not out.flags.c_contiguous:
+                out = np.ascontiguousarray(out)
+                allocations += 1
+        self.allocations = allocations
+        return out.reshape(audio.shape)
+
+    __call__ = process
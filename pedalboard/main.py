@@ -2,6 +2,15 @@
 import argparse
 from effects_processor import EffectsProcessor
 from effects_presets import get_effect_presets, get_individual_effects
+from streaming import StreamingUnsupportedError
+from telemetry import format_stats, write_prometheus
+
+
+def print_progress(frames_done, total_frames, frames_per_second):
+    """Print file rendering progress on a single line"""
+    percent = 100.0 * frames_done / total_frames if total_frames else 100.0
+    print(f"\r{percent:5.1f}% ({frames_done}/{total_frames} frames, {frames_per_second:,.0f} frames/s)",
+          end="", flush=True)
 
 
 def main():
@@ -16,12 +25,102 @@ def main():
     process_parser.add_argument("input_file", help="Input audio file to process")
     process_parser.add_argument("output_file", help="Output audio file")
     process_parser.add_argument("--preset", help="Effect preset to use", choices=get_effect_presets().keys())
+    process_parser.add_argument("--tail-seconds", type=float, default=0.0,
+                                help="Seconds of reverb/delay tail to render past the end of the input")
+
+    # Batch render command
+    batch_parser = subparsers.add_parser("batch", help="Render a directory of audio files in parallel")
+    batch_parser.add_argument("input_dir", help="Directory of audio files to process")
+    batch_parser.add_argument("output_dir", help="Directory to write processed files to")
+    batch_parser.add_argument("--preset", help="Effect preset to use", choices=get_effect_presets().keys())
+    batch_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument("--tail-seconds", type=float, default=0.0,
+                              help="Seconds of reverb/delay tail to render past the end of each input")
+    batch_parser.add_argument("--force", action="store_true", help="Re-render files that are already up to date")
 
     # Real-time processing command
     realtime_parser = subparsers.add_parser("realtime", help="Start real-time processing")
     realtime_parser.add_argument("--preset", help="Effect preset to use", choices=get_effect_presets().keys())
     realtime_parser.add_argument("--sample-rate", type=int, default=44100, help="Sample rate (default: 44100)")
-    realtime_parser.add_argument("--block-size", type=int, default=512, help="Block size (default: 512)")
+    realtime_parser.add_argument("--block-size", type=int, default=None,
+                                 help="Block size (default: from the tuning profile, else 512)")
+    realtime_parser.add_argument("--queue-blocks", type=int, default=None,
+                                 help="Blocks buffered per direction, bounds latency "
+                                      "(default: from the tuning profile, else 4)")
+    realtime_parser.add_argument("--mode", choices=["threaded", "duplex"], default="threaded",
+                                 help="threaded: separate streams plus a processing thread (for heavy chains); "
+                                      "duplex: process inside one full-duplex stream callback (lowest latency)")
+    realtime_parser.add_argument("--channels", type=int, default=1, help="Input channels (default: 1)")
+    realtime_parser.add_argument("--output-channels", type=int, default=1,
+                                 help="Output channels; inputs are summed into them (default: 1)")
+    realtime_parser.add_argument("--channel-preset", action="append", default=[], metavar="CHANNEL=PRESET",
+                                 help="Preset for one input channel, e.g. 0=Rock (repeatable)")
+    realtime_parser.add_argument("--virtual-input", metavar="FILE",
+                                 help="Run headless on a virtual device fed from this audio file "
+                                      "('synth' for a synthesized guitar signal)")
+    realtime_parser.add_argument("--virtual-output", metavar="FILE", help="Capture the virtual device's output here")
+    realtime_parser.add_argument("--speed", type=float, default=1.0,
+                                 help="Virtual device pacing as a multiple of real time, 0 = unpaced (default: 1)")
+    realtime_parser.add_argument("--duration", type=float, default=None,
+                                 help="Stop the virtual device after this many seconds")
+    realtime_parser.add_argument("--stats-interval", type=float, default=0,
+                                 help="Print real-time statistics every N seconds (default: off)")
+    realtime_parser.add_argument("--stats-file",
+                                 help="Write statistics in Prometheus text format to this file every interval")
+    realtime_parser.add_argument("--realtime", action="store_true",
+                                 help="Raise the processing thread's priority and control GC while streaming")
+    realtime_parser.add_argument("--rt-priority", type=int, default=70,
+                                 help="SCHED_FIFO priority used with --realtime (default: 70)")
+    realtime_parser.add_argument("--rt-cpu", type=int, default=None,
+                                 help="Pin the processing thread to this CPU core (with --realtime)")
+    realtime_parser.add_argument("--no-gc-control", action="store_true",
+                                 help="With --realtime, leave Python's garbage collector alone")
+    realtime_parser.add_argument("--highpass", type=float, metavar="HZ",
+                                 help="High-pass filter the input before the effects")
+    realtime_parser.add_argument("--lowpass", type=float, metavar="HZ",
+                                 help="Low-pass filter the input before the effects")
+    realtime_parser.add_argument("--click", type=float, metavar="BPM",
+                                 help="Mix a sample-accurate metronome click into the output")
+    realtime_parser.add_argument("--click-accents", type=float, nargs="+", default=None, metavar="LEVEL",
+                                 help="Click level of each beat of the bar (default: 1.0 0.6 0.6 0.6)")
+
+    # Benchmark command
+    bench_parser = subparsers.add_parser("bench", help="Benchmark presets and effects over block sizes and sample rates")
+    bench_parser.add_argument("--block-sizes", type=int, nargs="+", default=None,
+                              help="Block sizes to test (default: 64 128 256 512 1024 2048 4096)")
+    bench_parser.add_argument("--sample-rates", type=int, nargs="+", default=None,
+                              help="Sample rates to test (default: 44100 48000)")
+    bench_parser.add_argument("--duration", type=float, default=None,
+                              help="Seconds of test signal per measurement (default: 10)")
+    bench_parser.add_argument("--only", nargs="+", help="Only benchmark targets whose name contains one of these")
+    bench_parser.add_argument("--output", help="Write results to this JSON file")
+    bench_parser.add_argument("--baseline", help="Compare against a previously saved JSON file")
+    bench_parser.add_argument("--threshold", type=float, default=None,
+                              help="Relative change flagged as a regression (default: 0.10)")
+
+    # Tune command
+    tune_parser = subparsers.add_parser("tune", help="Find the smallest safe block size for a preset on this machine")
+    tune_parser.add_argument("--preset", help="Effect preset to tune", choices=get_effect_presets().keys())
+    tune_parser.add_argument("--sample-rate", type=int, default=44100, help="Sample rate (default: 44100)")
+    tune_parser.add_argument("--mode", choices=["threaded", "duplex"], default="threaded",
+                             help="Processing mode to tune (default: threaded)")
+    tune_parser.add_argument("--live", action="store_true",
+                             help="Tune against the real audio device instead of a virtual one")
+    tune_parser.add_argument("--target-xrun-rate", type=float, default=None,
+                             help="Highest acceptable xruns per block (default: 0.001)")
+    tune_parser.add_argument("--headroom", type=float, default=None,
+                             help="Fraction of the block deadline to keep free (default: 0.5)")
+    tune_parser.add_argument("--trial-seconds", type=float, default=None,
+                             help="Seconds to run each candidate (default: 5)")
+
+    # Calibrate latency command
+    calibrate_parser = subparsers.add_parser(
+        "calibrate-latency", help="Measure and store the interface's round-trip latency for metronome recording")
+    calibrate_parser.add_argument("--device", default=None,
+                                  help="Device name pattern used for input and output (default: system default)")
+    calibrate_parser.add_argument("--sample-rate", type=int, default=44100, help="Sample rate (default: 44100)")
+    calibrate_parser.add_argument("--block-size", type=int, default=1024, help="Block size (default: 1024)")
+    calibrate_parser.add_argument("--channels", type=int, default=1, help="Channels (default: 1)")
 
     # List presets command
     subparsers.add_parser("list-presets", help="List available effect presets")
@@ -43,39 +142,185 @@ def main():
             presets = get_effect_presets()
             if args.preset in presets:
                 preset_board = presets[args.preset]()
-                for effect in preset_board:
-                    processor.add_effect(effect)
+                # No live warm-up: process_file probes the chain itself
+                processor.set_chain(preset_board, warm=False)
                 print(f"Applied {args.preset} preset with {len(preset_board)} effects")
 
-        processor.process_file(args.input_file, args.output_file)
+        processor.process_file(args.input_file, args.output_file, tail_seconds=args.tail_seconds,
+                               progress_callback=print_progress)
+        print()
         print(f"Processed {args.input_file} -> {args.output_file}")
 
+    elif args.command == "batch":
+        from batch_render import render_batch
+        summary = render_batch(args.input_dir, args.output_dir, preset_name=args.preset, workers=args.workers,
+                               tail_seconds=args.tail_seconds, force=args.force)
+        print(f"Rendered {summary['rendered']} files ({summary['skipped']} skipped, "
+              f"{len(summary['failed'])} failed): {summary['audio_seconds']:.1f}s of audio in "
+              f"{summary['wall_seconds']:.1f}s, {summary['realtime_multiple']:.1f}x real-time")
+
     elif args.command == "realtime":
+        if args.block_size is None or args.queue_blocks is None:
+            # Fall back to this machine's tuning profile for the preset, then to the defaults
+            from tuner import load_profile
+            profile = load_profile(args.preset, args.sample_rate, args.mode) or {}
+            if profile:
+                print(f"Using tuned profile: block size {profile['block_size']}, "
+                      f"queue {profile['queue_blocks']} blocks")
+            if args.block_size is None:
+                args.block_size = profile.get("block_size", 512)
+            if args.queue_blocks is None:
+                args.queue_blocks = profile.get("queue_blocks", 4)
+
+        device = None
+        if args.virtual_input:
+            if args.speed == 0 and args.mode != "duplex":
+                parser.error("--speed 0 needs --mode duplex: unpaced, nothing makes the virtual device wait "
+                             "for the processing thread")
+            from stream_backends import VirtualDevice
+            source = args.virtual_input
+            if source == "synth":
+                from benchmark import synthesize_guitar
+                source = synthesize_guitar(args.duration or 10.0, args.sample_rate)
+            device = VirtualDevice(source, samplerate=args.sample_rate, blocksize=args.block_size,
+                                   speed=args.speed, duration=args.duration, capture_file=args.virtual_output)
+
+        policy = None
+        if args.realtime:
+            from rt_scheduling import RealtimePolicy
+            policy = RealtimePolicy(priority=args.rt_priority, cpu=args.rt_cpu, control_gc=not args.no_gc_control)
+
         processor = EffectsProcessor(
             sample_rate=args.sample_rate,
             block_size=args.block_size,
-            channels=1
+            channels=args.channels,
+            output_channels=args.output_channels,
+            queue_blocks=args.queue_blocks,
+            mode=args.mode,
+            backend=device,
+            realtime_policy=policy
         )
 
-        if args.preset:
-            presets = get_effect_presets()
-            if args.preset in presets:
-                preset_board = presets[args.preset]()
-                for effect in preset_board:
-                    processor.add_effect(effect)
-                print(f"Applied {args.preset} preset with {len(preset_board)} effects")
+        try:
+            if args.preset:
+                presets = get_effect_presets()
+                if args.preset in presets:
+                    preset_board = presets[args.preset]()
+                    processor.set_chain(preset_board)
+                    print(f"Applied {args.preset} preset with {len(preset_board)} effects")
+
+            if args.highpass or args.lowpass:
+                from effect_graph import EffectGraph
+                from iir_filter import FilterBank, IIRFilter
+                filters = []
+                if args.highpass:
+                    filters.append(IIRFilter("highpass", args.highpass))
+                if args.lowpass:
+                    filters.append(IIRFilter("lowpass", args.lowpass))
+                # Filter in front of whatever chain is loaded
+                processor.set_chain(EffectGraph([processor.get_effects()], pre=FilterBank(filters)))
 
-        print("Starting real-time processing. Press Ctrl+C to stop.")
-        processor.start()
+            for assignment in args.channel_preset:
+                channel, _, preset_name = assignment.partition("=")
+                presets = get_effect_presets()
+                if not channel.isdigit() or preset_name not in presets:
+                    parser.error(f"Invalid --channel-preset {assignment!r}, expected CHANNEL=PRESET")
+                if int(channel) >= args.channels:
+                    parser.error(f"Invalid --channel-preset {assignment!r}: channel {channel} out of range "
+                                 f"for --channels {args.channels}")
+                processor.set_channel_chain(int(channel), presets[preset_name]())
+                print(f"Applied {preset_name} preset to input channel {channel}")
 
+            if args.click:
+                from click_track import ClickTrack
+                processor.add_output_mixer(ClickTrack(args.click, args.sample_rate, accents=args.click_accents))
+                print(f"Click at {args.click:g} BPM")
+
+            print("Starting real-time processing. Press Ctrl+C to stop.")
+            processor.start()
+        except StreamingUnsupportedError as e:
+            print(f"Error: {e}")
+            raise SystemExit(1)
+
+        interval = args.stats_interval or (1 if args.stats_file else 0)
         try:
-            # Keep the program running until interrupted
+            # Keep the program running until interrupted (or the virtual input runs out)
             while True:
-                import time
-                time.sleep(1)
+                if device is not None:
+                    if device.wait(interval or 1):
+                        break
+                else:
+                    import time
+                    time.sleep(interval or 1)
+                if interval:
+                    stats = processor.get_stats()
+                    if args.stats_interval:
+                        print(format_stats(stats))
+                    if args.stats_file:
+                        write_prometheus(stats, args.stats_file)
         except KeyboardInterrupt:
-            processor.stop()
-            print("Stopped real-time processing")
+            pass
+        processor.stop()
+        print("Stopped real-time processing")
+        if device is not None:
+            print(format_stats(processor.get_stats()))
+            print(f"Virtual device: {device.blocks} blocks, {device.late_blocks} late")
+            if args.stats_file:
+                write_prometheus(processor.get_stats(), args.stats_file)
+
+    elif args.command == "tune":
+        import tuner
+        trial = tuner.tune(
+            args.preset,
+            sample_rate=args.sample_rate,
+            mode=args.mode,
+            target_xrun_rate=args.target_xrun_rate if args.target_xrun_rate is not None
+            else tuner.DEFAULT_TARGET_XRUN_RATE,
+            headroom=args.headroom if args.headroom is not None else tuner.DEFAULT_HEADROOM,
+            duration=args.trial_seconds or tuner.DEFAULT_TRIAL_SECONDS,
+            live=args.live
+        )
+        if trial is None:
+            print("No block size met the targets; try a lower headroom or a higher xrun rate")
+            raise SystemExit(1)
+        tuner.save_profile(args.preset, args.sample_rate, args.mode, trial)
+        print(f"Tuned {args.preset or 'None'}: block size {trial['block_size']}, "
+              f"queue {trial['queue_blocks']} blocks (~{trial['latency_ms']:.1f} ms buffering). "
+              f"Saved to {tuner.PROFILE_PATH}")
+
+    elif args.command == "bench":
+        import benchmark
+        report = benchmark.run_benchmarks(
+            block_sizes=args.block_sizes or benchmark.DEFAULT_BLOCK_SIZES,
+            sample_rates=args.sample_rates or benchmark.DEFAULT_SAMPLE_RATES,
+            duration=args.duration or benchmark.DEFAULT_DURATION,
+            targets=args.only
+        )
+        if args.output:
+            benchmark.save_results(report, args.output)
+            print(f"Saved results to {args.output}")
+        if args.baseline:
+            threshold = args.threshold if args.threshold is not None else benchmark.DEFAULT_THRESHOLD
+            regressions = benchmark.compare_results(report, benchmark.load_results(args.baseline), threshold)
+            for point, metric, old, new in regressions:
+                print(f"REGRESSION {point['target']} {point['sample_rate']} Hz block {point['block_size']}: "
+                      f"{metric} {old:.3f} -> {new:.3f}")
+            print(f"{len(regressions)} regressions against {args.baseline}")
+            if regressions:
+                raise SystemExit(1)
+
+    elif args.command == "calibrate-latency":
+        from device_registry import get_registry
+        from synced_recording import calibrate_latency, LATENCY_PATH
+        print("Playing a test impulse; the interface's output must be cabled to its input")
+        try:
+            latency = calibrate_latency(get_registry().backend_for(args.device, args.device), args.device,
+                                        args.sample_rate, args.block_size, args.channels)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            raise SystemExit(1)
+        print(f"Round-trip latency {latency} frames ({1000.0 * latency / args.sample_rate:.1f} ms) "
+              f"for {args.device or 'the default device'}. Saved to {LATENCY_PATH}")
 
     elif args.command == "list-presets":
         presets = get_effect_presets()
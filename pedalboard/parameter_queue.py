@@ -0,0 +1,114 @@
+# parameter_queue.py
+import collections
+import math
+
+RAMP_CURVES = ("linear", "exponential")
+
+
+class _Ramp:
+    """Per-parameter ramp state, advanced once per block"""
+
+    __slots__ = ("start", "target", "blocks", "step", "curve")
+
+    def __init__(self, start, target, blocks, curve):
+        self.start = start
+        self.target = target
+        self.blocks = blocks
+        self.step = 0
+        self.curve = curve
+
+    def next_value(self):
+        self.step += 1
+        if self.step >= self.blocks:
+            return self.target
+        if self.curve == "exponential":
+            # One-pole approach that covers ~99% of the distance in `blocks` steps
+            progress = 1.0 - math.exp(-4.6 * self.step / self.blocks)
+        else:
+            progress = self.step / self.blocks
+        return self.start + (self.target - self.start) * progress
+
+    def done(self):
+        return self.step >= self.blocks
+
+
+class ParameterQueue:
+    """Parameter changes from UI threads, applied on the audio thread.
+
+    Writers push (plugin, parameter, value) commands onto a deque, whose
+    append/popleft are atomic in CPython, so no lock is shared with the
+    audio thread. The audio thread calls apply_pending() once per block:
+    all queued writes to the same parameter are coalesced into one, and
+    numeric parameters can be ramped to their new value over several
+    blocks instead of jumping (which causes zipper noise).
+
+    Values should be validated before they are pushed. A change the
+    plugin still rejects is dropped on the audio thread rather than
+    raised there, and counted by apply_pending().
+    """
+
+    def __init__(self, ramp_blocks=0, curve="linear"):
+        if curve not in RAMP_CURVES:
+            raise ValueError(f"curve must be one of {RAMP_CURVES}")
+        self.ramp_blocks = ramp_blocks
+        self.curve = curve
+        self._commands = collections.deque()
+        self._ramps = {}
+
+    def push(self, plugin, parameter_name, value, ramp_blocks=None, curve=None):
+        """Queue a parameter change (called from any thread)"""
+        if curve is not None and curve not in RAMP_CURVES:
+            raise ValueError(f"curve must be one of {RAMP_CURVES}")
+        self._commands.append((plugin, parameter_name, value, ramp_blocks, curve))
+
+    def pending(self):
+        return len(self._commands) + len(self._ramps)
+
+    def apply_pending(self):
+        """Drain queued commands and advance ramps (called once per block)
+
+        Returns the number of changes dropped because the plugin rejected them.
+        """
+        rejected = 0
+        if self._commands:
+            # Coalesce: only the last write to each parameter counts
+            latest = {}
+            while self._commands:
+                command = self._commands.popleft()
+                latest[(id(command[0]), command[1])] = command
+            for key, (plugin, name, value, ramp_blocks, curve) in latest.items():
+                try:
+                    self._start(key, plugin, name, value, ramp_blocks, curve)
+                except Exception:
+                    self._ramps.pop(key, None)
+                    rejected += 1
+
+        if self._ramps:
+            for key in list(self._ramps):
+                plugin, name, ramp = self._ramps[key]
+                try:
+                    setattr(plugin, name, ramp.next_value())
+                except Exception:
+                    del self._ramps[key]
+                    rejected += 1
+                    continue
+                if ramp.done():
+                    del self._ramps[key]
+        return rejected
+
+    def _start(self, key, plugin, name, value, ramp_blocks, curve):
+        blocks = self.ramp_blocks if ramp_blocks is None else ramp_blocks
+        current = getattr(plugin, name)
+        numeric = (isinstance(value, (int, float)) and not isinstance(value, bool)
+                   and isinstance(current, (int, float)) and not isinstance(current, bool))
+        if blocks <= 1 or not numeric:
+            # Switches, enums and un-ramped values take effect immediately
+            self._ramps.pop(key, None)
+            setattr(plugin, name, value)
+            return
+        # A new target restarts the ramp from wherever the parameter is now
+        self._ramps[key] = (plugin, name, _Ramp(float(current), float(value), blocks, curve or self.curve))
+
+    def clear(self):
+        self._commands.clear()
+        self._ramps.clear()
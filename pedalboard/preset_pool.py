@@ -0,0 +1,80 @@
+# preset_pool.py
+import threading
+from collections import OrderedDict
+from effects_presets import get_effect_presets
+from streaming import measure_latency, reset_chain
+
+
+class PresetPool:
+    """Pool of prebuilt, warmed preset chains keyed by preset name.
+
+    checkout() hands out an idle chain for the preset (building and warming
+    one only if none is idle) and resets it so no state from its previous
+    use leaks through. checkin() returns it for reuse. At most max_size idle
+    chains are kept; when over the limit, chains of the least recently used
+    preset are evicted first.
+    """
+
+    def __init__(self, presets=None, max_size=8, sample_rate=44100, block_size=512, channels=1):
+        self.presets = presets if presets is not None else get_effect_presets()
+        self.max_size = max_size
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self._idle = OrderedDict()  # preset name -> idle chains, least recently used first
+        self._latency = {}          # preset name -> measured latency in samples
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(chains) for chains in self._idle.values())
+
+    def _build(self, name):
+        """Construct and warm a new chain for a preset"""
+        if name not in self.presets:
+            raise KeyError(f"Preset {name} not found")
+        chain = self.presets[name]()
+        # The latency probe runs blocks through the chain, which allocates
+        # the plugins' internal buffers, and leaves it reset
+        self._latency[name] = measure_latency(chain, self.sample_rate, self.block_size, self.channels)
+        return chain
+
+    def latency(self, name):
+        """Latency in samples of the preset's chains (None if none built yet)"""
+        return self._latency.get(name)
+
+    def checkout(self, name):
+        """Get a ready-to-use chain for a preset"""
+        with self._lock:
+            chains = self._idle.get(name)
+            chain = chains.pop() if chains else None
+            if name in self._idle:
+                self._idle.move_to_end(name)
+                if not chains:
+                    del self._idle[name]
+        if chain is None:
+            return self._build(name)
+        reset_chain(chain)
+        return chain
+
+    def checkin(self, name, chain):
+        """Return a chain to the pool. It must not be in use any more."""
+        with self._lock:
+            self._idle.setdefault(name, []).append(chain)
+            self._idle.move_to_end(name)
+            self._evict()
+
+    def _evict(self):
+        total = sum(len(chains) for chains in self._idle.values())
+        while total > self.max_size:
+            name, chains = next(iter(self._idle.items()))
+            chains.pop(0)
+            total -= 1
+            if not chains:
+                del self._idle[name]
+
+    def prewarm(self, names=None, count=1):
+        """Build `count` idle chains for each preset ahead of time"""
+        for name in names or list(self.presets):
+            for _ in range(count):
+                self.checkin(name, self._build(name))
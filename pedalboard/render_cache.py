@@ -0,0 +1,118 @@
+# render_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+
+def plugin_parameters(plugin):
+    """Get a plugin's public, non-callable attributes as a dict"""
+    params = {}
+    for name in dir(plugin):
+        if name.startswith('_'):
+            continue
+        try:
+            value = getattr(plugin, name)
+        except Exception:
+            continue
+        if not callable(value):
+            params[name] = value
+    return params
+
+
+def serialize_chain(chain):
+    """Canonical, JSON-serializable description of a chain: plugin types and parameter values"""
+    if hasattr(chain, "describe"):
+        # Graphs describe their own structure (branches, gains)
+        return chain.describe()
+    serialized = []
+    for plugin in chain:
+        entry = {"type": type(plugin).__name__}
+        if hasattr(plugin, "__iter__"):
+            # Nested containers (Pedalboard, Chain, Mix) are described recursively
+            entry["plugins"] = serialize_chain(plugin)
+        else:
+            entry["params"] = plugin_parameters(plugin)
+        serialized.append(entry)
+    return serialized
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _describe_render(chain, settings):
+    return json.dumps({"chain": serialize_chain(chain), "settings": settings}, sort_keys=True, default=str)
+
+
+def settings_key(chain, **settings):
+    """Key for a chain and render settings alone, without hashing any input"""
+    return hashlib.sha256(_describe_render(chain, settings).encode()).hexdigest()
+
+
+def render_key(input_file, chain, **settings):
+    """Cache key for rendering input_file through chain with the given render settings"""
+    description = _describe_render(chain, settings)
+    digest = hashlib.sha256()
+    digest.update(hash_file(input_file).encode())
+    digest.update(description.encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Content-addressed on-disk cache of rendered files.
+
+    Entries are named after their key. A hit bumps the file's mtime, and
+    when the cache grows past max_bytes the least recently used entries
+    (oldest mtime) are deleted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, extension=".wav"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def get(self, key):
+        """Return the cached file for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, rendered_file):
+        """Move a freshly rendered file into the cache and return its cached path"""
+        path = self.path_for(key)
+        shutil.move(rendered_file, path)
+        self._evict(keep=os.path.basename(path))
+        return path
+
+    def _evict(self, keep=None):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(self.extension) and name != keep:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            if keep and os.path.exists(os.path.join(self.cache_dir, keep)):
+                total += os.path.getsize(os.path.join(self.cache_dir, keep))
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
@@ -0,0 +1,87 @@
+# ring_buffer.py
+import numpy as np
+
+
+class RingBuffer:
+    """Single-producer/single-consumer ring of fixed-size audio blocks.
+
+    The storage is one preallocated float32 array of shape
+    (num_blocks, block_size, channels). The producer only ever advances
+    the write index and the consumer only ever advances the read index, so
+    the two sides never need a lock: each index is a plain int that is
+    assigned atomically under the GIL. Nothing is allocated after
+    construction, which makes it safe to use from PortAudio callbacks.
+    """
+
+    def __init__(self, num_blocks, block_size, channels=1, dtype=np.float32):
+        if num_blocks < 1:
+            raise ValueError("num_blocks must be at least 1")
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        self.channels = channels
+        self._buffer = np.zeros((num_blocks, block_size, channels), dtype=dtype)
+        # Monotonic counters; the slot is the counter modulo num_blocks
+        self._write_index = 0
+        self._read_index = 0
+
+    def __len__(self):
+        """Number of blocks ready to be read"""
+        return self._write_index - self._read_index
+
+    @property
+    def write_index(self):
+        """Blocks written so far; the next write() fills slot write_index % num_blocks"""
+        return self._write_index
+
+    @property
+    def read_index(self):
+        """Blocks read so far; the oldest block is in slot read_index % num_blocks"""
+        return self._read_index
+
+    def free(self):
+        """Number of blocks that can be written before the ring is full"""
+        return self.num_blocks - len(self)
+
+    def is_empty(self):
+        return self._write_index == self._read_index
+
+    def is_full(self):
+        return len(self) >= self.num_blocks
+
+    # Producer side
+
+    def write(self, block):
+        """Copy a block into the ring. Returns False if the ring is full."""
+        if self.is_full():
+            return False
+        np.copyto(self._buffer[self._write_index % self.num_blocks], block)
+        self._write_index += 1
+        return True
+
+    # Consumer side
+
+    def read_into(self, out):
+        """Copy the oldest block into `out`. Returns False if the ring is empty."""
+        if self.is_empty():
+            return False
+        np.copyto(out, self._buffer[self._read_index % self.num_blocks])
+        self._read_index += 1
+        return True
+
+    def peek(self):
+        """Return a view of the oldest block without consuming it, or None.
+
+        The view stays valid until advance() is called.
+        """
+        if self.is_empty():
+            return None
+        return self._buffer[self._read_index % self.num_blocks]
+
+    def advance(self):
+        """Release the block returned by peek()"""
+        if not self.is_empty():
+            self._read_index += 1
+
+    def clear(self):
+        """Drop all buffered blocks. Only call while neither side is active."""
+        self._read_index = self._write_index = 0
@@ -0,0 +1,142 @@
+# rt_scheduling.py
+import gc
+import os
+import threading
+import time
+
+DEFAULT_RT_PRIORITY = 70  # SCHED_FIFO priority when permitted (1-99 on Linux)
+DEFAULT_NICE = -10        # Fallback when real-time scheduling is not permitted
+GC_IDLE_SECONDS = 5.0     # Minimum time between idle-gap collections while streaming
+
+
+def promote_current_thread(priority=DEFAULT_RT_PRIORITY, cpu=None, nice=DEFAULT_NICE):
+    """Raise the calling thread's scheduling priority and optionally pin it to a CPU
+
+    Tries SCHED_FIFO first, then a lower nice value. Linux applies both of
+    these per thread when called with pid 0 from the thread itself.
+    Returns (applied, failed) lists of human-readable messages.
+    """
+    applied, failed = [], []
+
+    if hasattr(os, "sched_setscheduler") and hasattr(os, "SCHED_FIFO"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            applied.append(f"SCHED_FIFO priority {priority}")
+        except (OSError, ValueError) as e:
+            failed.append(f"SCHED_FIFO priority {priority}: {e}")
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, nice)
+                applied.append(f"nice {nice}")
+            except (OSError, AttributeError) as e:
+                failed.append(f"nice {nice}: {e}")
+    else:
+        failed.append("real-time scheduling is not supported on this platform")
+
+    if cpu is not None:
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, {cpu})
+                applied.append(f"pinned to CPU {cpu}")
+            except OSError as e:
+                failed.append(f"CPU affinity {cpu}: {e}")
+        else:
+            failed.append("CPU affinity is not supported on this platform")
+
+    return applied, failed
+
+
+class GCController:
+    """Keeps Python's cyclic GC from pausing the audio thread mid-block
+
+    While active, everything allocated so far is frozen into the permanent
+    generation and automatic collection is disabled. Young-generation
+    collections are run instead in idle gaps: the processing thread calls
+    collect_if_due() while it waits for input. Without such a thread (e.g.
+    duplex mode) a background thread collects every `idle_seconds`.
+    Reference counting still frees acyclic garbage immediately.
+    """
+
+    def __init__(self, idle_seconds=GC_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.collections = 0
+        self._was_enabled = None
+        self._next_collection = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, background=False):
+        self._was_enabled = gc.isenabled()
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+        gc.disable()
+        self._next_collection = time.monotonic() + self.idle_seconds
+        if background:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._collect_periodically, daemon=True, name="gc-idle")
+            self._thread.start()
+
+    def collect_if_due(self):
+        """Run a young-generation collection if one is due. Call only when idle."""
+        if time.monotonic() >= self._next_collection:
+            gc.collect(0)
+            self.collections += 1
+            self._next_collection = time.monotonic() + self.idle_seconds
+
+    def _collect_periodically(self):
+        while not self._stop.wait(self.idle_seconds):
+            gc.collect(0)
+            self.collections += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if hasattr(gc, "unfreeze"):
+            gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+
+
+class RealtimePolicy:
+    """Opt-in real-time settings for the audio processing thread
+
+    apply_to_current_thread() is called by the thread itself when it starts;
+    start()/stop() bracket the streaming session for GC control. Everything
+    that could not be applied is collected in `failed` for reporting.
+    """
+
+    def __init__(self, priority=DEFAULT_RT_PRIORITY, cpu=None, control_gc=True, gc_idle_seconds=GC_IDLE_SECONDS):
+        self.priority = priority
+        self.cpu = cpu
+        self.control_gc = control_gc
+        self.gc = GCController(gc_idle_seconds) if control_gc else None
+        self.applied = []
+        self.failed = []
+
+    def start(self, background_gc=False):
+        self.applied, self.failed = [], []
+        if self.gc:
+            self.gc.start(background=background_gc)
+            self.applied.append("generational GC frozen and disabled while streaming")
+
+    def idle(self):
+        """Called by the processing thread while it has nothing to do"""
+        if self.gc:
+            self.gc.collect_if_due()
+
+    def apply_to_current_thread(self):
+        applied, failed = promote_current_thread(self.priority, self.cpu)
+        name = threading.current_thread().name
+        self.applied.extend(f"{name}: {message}" for message in applied)
+        self.failed.extend(f"{name}: {message}" for message in failed)
+
+    def stop(self):
+        if self.gc:
+            self.gc.stop()
+
+    def report(self):
+        lines = [f"applied: {message}" for message in self.applied]
+        lines += [f"not applied: {message}" for message in self.failed]
+        return "\n".join(lines)
@@ -0,0 +1,304 @@
+# stream_backends.py
+import threading
+import time
+import numpy as np
+
+
+class SoundDeviceBackend:
+    """Opens real PortAudio streams through sounddevice
+
+    Every open_* method takes an optional `device` that overrides the
+    backend's own device for that one stream.
+    """
+
+    def __init__(self, input_device=None, output_device=None):
+        self.input_device = input_device
+        self.output_device = output_device
+
+    def open_input(self, channels, samplerate, blocksize, callback, device=None):
+        import sounddevice as sd
+        return sd.InputStream(device=self.input_device if device is None else device, channels=channels, samplerate=samplerate,
+                              blocksize=blocksize, dtype='float32', callback=callback)
+
+    def open_output(self, channels, samplerate, blocksize, callback, device=None):
+        import sounddevice as sd
+        return sd.OutputStream(device=self.output_device if device is None else device, channels=channels, samplerate=samplerate,
+                               blocksize=blocksize, dtype='float32', callback=callback)
+
+    def open_duplex(self, channels, samplerate, blocksize, callback, device=None):
+        """channels and device are (input, output) pairs"""
+        import sounddevice as sd
+        if device is None:
+            device = (self.input_device, self.output_device)
+        return sd.Stream(device=device, channels=channels,
+                         samplerate=samplerate, blocksize=blocksize, dtype='float32', callback=callback)
+
+
+class VirtualStatus:
+    """Stand-in for sounddevice.CallbackFlags; falsy when nothing went wrong"""
+
+    __slots__ = ("input_overflow", "output_underflow")
+
+    def __init__(self, input_overflow=False, output_underflow=False):
+        self.input_overflow = input_overflow
+        self.output_underflow = output_underflow
+
+    def __bool__(self):
+        return self.input_overflow or self.output_underflow
+
+    def __str__(self):
+        flags = [name for name in self.__slots__ if getattr(self, name)]
+        return ", ".join(flags) or "ok"
+
+
+class VirtualStream:
+    """A stream opened on a VirtualDevice. Same start/stop/close API as sounddevice streams."""
+
+    def __init__(self, device, kind, channels, callback):
+        self.device = device
+        self.kind = kind  # "input", "output" or "duplex"
+        self.channels = channels
+        self.callback = callback
+        self.active = False
+
+    def start(self):
+        self.active = True
+        self.device._stream_started(self)
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+        self.device._stream_closed(self)
+
+
+class VirtualDevice:
+    """Headless audio device that drives stream callbacks from a file or generator
+
+    The device clock runs on its own thread and calls the callbacks of all
+    streams opened on it once per block, at exact real-time pacing, or
+    `speed` times faster (speed=0 runs as fast as possible). The clock
+    starts once every stream opened on the device has been started. Input comes
+    from `source`: a path to an audio file, a (frames, channels) array, or
+    a generator function gen(frames, channels) -> array returning None
+    when it is done. Output is captured in memory and optionally written
+    to `capture_file`.
+
+    If a block's callbacks start more than one block late the next
+    callback sees output_underflow, as PortAudio would report it.
+
+    With `loopback` (frames, at least one block) the device behaves as if
+    a cable ran from its output back to its input with that round-trip
+    latency: the input hears the output, mixed with `source` if one is
+    given. `source` may be None for silence until `duration` or stop.
+
+    Unpaced, the clock cannot wait for a consumer between a separate input
+    and output stream (such as a processing thread), so speed=0 only
+    accepts duplex streams or streams of a single direction.
+    """
+
+    def __init__(self, source=None, samplerate=44100, blocksize=512, speed=1.0, loop=False, duration=None,
+                 capture_file=None, loopback=None):
+        if loopback is not None and loopback < blocksize:
+            raise ValueError("loopback latency must be at least one block")
+        self.source = source
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.speed = speed
+        self.loop = loop
+        self.duration = duration
+        self.capture_file = capture_file
+        self.loopback = loopback
+        self.streams = []
+        self.captured = []
+        self.blocks = 0
+        self.late_blocks = 0
+        self.finished = threading.Event()
+        self._thread = None
+        self._source_audio = None
+        self._source_pos = 0
+
+    # Backend API, used by EffectsProcessor. There is only one device, so `device` is ignored.
+
+    def open_input(self, channels, samplerate, blocksize, callback, device=None):
+        return self._open("input", channels, samplerate, blocksize, callback)
+
+    def open_output(self, channels, samplerate, blocksize, callback, device=None):
+        return self._open("output", channels, samplerate, blocksize, callback)
+
+    def open_duplex(self, channels, samplerate, blocksize, callback, device=None):
+        return self._open("duplex", channels, samplerate, blocksize, callback)
+
+    def _open(self, kind, channels, samplerate, blocksize, callback):
+        if samplerate != self.samplerate or blocksize != self.blocksize:
+            raise ValueError(f"Virtual device runs at {self.samplerate} Hz / {self.blocksize} frames, "
+                             f"got {samplerate} Hz / {blocksize} frames")
+        if not self.speed:
+            directions = {s.kind for s in self.streams} | {kind}
+            if {"input", "output"} <= directions:
+                raise ValueError("An unpaced virtual device (speed=0) cannot drive separate input and output "
+                                 "streams: use a duplex stream or speed > 0")
+        stream = VirtualStream(self, kind, channels, callback)
+        self.streams.append(stream)
+        return stream
+
+    def _stream_started(self, stream):
+        # The clock starts once every opened stream has been started, so no
+        # stream misses the first blocks
+        if self._thread is None and all(s.active for s in self.streams):
+            self.finished.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="virtual-device")
+            self._thread.start()
+
+    def _stream_closed(self, stream):
+        if stream in self.streams:
+            self.streams.remove(stream)
+        if not self.streams and self._thread:
+            self.finished.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def wait(self, timeout=None):
+        """Wait until the source is exhausted"""
+        return self.finished.wait(timeout)
+
+    # Source handling
+
+    def _load_source(self, channels):
+        if isinstance(self.source, str):
+            from pedalboard.io import AudioFile
+            with AudioFile(self.source).resampled_to(self.samplerate) as f:
+                self._source_audio = np.ascontiguousarray(f.read(f.frames).T, dtype=np.float32)
+        elif isinstance(self.source, np.ndarray):
+            audio = self.source if self.source.ndim == 2 else self.source[:, np.newaxis]
+            self._source_audio = audio.astype(np.float32, copy=False)
+        # Match the channel count the input stream asked for
+        if self._source_audio is not None and self._source_audio.shape[1] != channels:
+            self._source_audio = np.repeat(self._source_audio[:, :1], channels, axis=1)
+
+    def _next_input(self, block):
+        """Fill block with the next input frames. Returns False when the source is done."""
+        frames, channels = block.shape
+        if self.source is None:
+            block.fill(0)
+            return True
+        if callable(self.source):
+            data = self.source(frames, channels)
+            if data is None:
+                return False
+            block[:] = np.asarray(data, dtype=np.float32).reshape(frames, channels)
+            return True
+
+        if self._source_audio is None:
+            self._load_source(channels)
+        audio = self._source_audio
+        filled = 0
+        while filled < frames:
+            if self._source_pos >= audio.shape[0]:
+                if not self.loop or audio.shape[0] == 0:
+                    break
+                self._source_pos = 0
+            n = min(frames - filled, audio.shape[0] - self._source_pos)
+            block[filled:filled + n] = audio[self._source_pos:self._source_pos + n]
+            self._source_pos += n
+            filled += n
+        if filled == 0:
+            return False
+        block[filled:] = 0
+        return True
+
+    # Clock
+
+    def _run(self):
+        inputs = [s for s in self.streams if s.kind in ("input", "duplex")]
+        outputs = [s for s in self.streams if s.kind in ("output", "duplex")]
+        in_channels = max([s.channels[0] if s.kind == "duplex" else s.channels for s in inputs] or [1])
+        out_channels = max([s.channels[1] if s.kind == "duplex" else s.channels for s in outputs] or [1])
+        in_block = np.zeros((self.blocksize, in_channels), dtype=np.float32)
+        out_block = np.zeros((self.blocksize, out_channels), dtype=np.float32)
+
+        max_blocks = None
+        if self.duration is not None:
+            max_blocks = int(np.ceil(self.duration * self.samplerate / self.blocksize))
+        interval = self.blocksize / self.samplerate / self.speed if self.speed else 0.0
+        writer = self._open_capture(out_channels)
+        # Output that has not yet come back round to the input, oldest first
+        loop_line = np.zeros((self.loopback, 1), dtype=np.float32) if self.loopback else None
+        next_tick = time.perf_counter()
+        late = False
+        try:
+            while self.streams and not self.finished.is_set():
+                if max_blocks is not None and self.blocks >= max_blocks:
+                    break
+                if not self._next_input(in_block):
+                    break
+                if loop_line is not None:
+                    in_block += loop_line[:self.blocksize]
+                    out_block.fill(0)
+
+                status = VirtualStatus(output_underflow=late)
+                for stream in list(self.streams):
+                    if not stream.active:
+                        continue
+                    if stream.kind == "input":
+                        stream.callback(in_block[:, :stream.channels], self.blocksize, None, VirtualStatus())
+                    elif stream.kind == "output":
+                        stream.callback(out_block[:, :stream.channels], self.blocksize, None, status)
+                    else:
+                        stream.callback(in_block[:, :stream.channels[0]], out_block[:, :stream.channels[1]],
+                                        self.blocksize, None, status)
+                if outputs:
+                    self._capture(out_block, writer)
+                if loop_line is not None:
+                    loop_line[:-self.blocksize] = loop_line[self.blocksize:]
+                    loop_line[-self.blocksize:] = out_block.mean(axis=1, keepdims=True)
+                self.blocks += 1
+
+                if interval:
+                    next_tick += interval
+                    delay = next_tick - time.perf_counter()
+                    late = delay < -interval
+                    if late:
+                        self.late_blocks += 1
+                        next_tick = time.perf_counter()  # Resynchronize, as a real device would
+                    elif delay > 0:
+                        time.sleep(delay)
+        finally:
+            if writer is not None:
+                writer.close()
+            self.finished.set()
+
+    def _open_capture(self, channels):
+        if not self.capture_file:
+            return None
+        from pedalboard.io import AudioFile
+        return AudioFile(self.capture_file, 'w', self.samplerate, channels)
+
+    def _capture(self, out_block, writer):
+        if writer is not None:
+            writer.write(np.ascontiguousarray(out_block.T))
+        else:
+            self.captured.append(out_block.copy())
+
+    def captured_audio(self):
+        """Output captured in memory, shaped (frames, channels)"""
+        if not self.captured:
+            return np.zeros((0, 1), dtype=np.float32)
+        return np.concatenate(self.captured, axis=0)
+
+
+def cross_correlation(reference, captured, max_lag=None):
+    """Cross-correlation of `captured` against `reference` for lags 0 .. max_lag - 1 (channels are averaged)"""
+    ref = np.asarray(reference, dtype=np.float64).reshape(len(reference), -1).mean(axis=1)
+    cap = np.asarray(captured, dtype=np.float64).reshape(len(captured), -1).mean(axis=1)
+    n = 1 << int(np.ceil(np.log2(len(ref) + len(cap))))
+    corr = np.fft.irfft(np.fft.rfft(cap, n) * np.conj(np.fft.rfft(ref, n)), n)
+    max_lag = len(cap) if max_lag is None else min(max_lag, len(cap))
+    return corr[:max_lag]
+
+
+def estimate_latency(reference, captured, max_lag=None):
+    """Estimate the delay in samples of `captured` relative to `reference` by cross-correlation"""
+    return int(np.argmax(cross_correlation(reference, captured, max_lag)))
@@ -0,0 +1,248 @@
+# streaming.py
+import numpy as np
+from pedalboard import Pedalboard
+from render_cache import plugin_parameters
+
+# Longest latency measure_latency() will wait for, in seconds
+MAX_PROBE_SECONDS = 2.0
+# Primed output measure_latency() checks for level and block sizes: at
+# least this many seconds and this many blocks
+CHECK_SECONDS = 0.25
+CHECK_BLOCKS = 4
+CHECK_WINDOW_SECONDS = 0.02
+PROBE_FREQUENCY = 220.0
+PROBE_LEVEL = 0.25
+# Streamed output this much quieter than a reset=True render counts as silent
+SILENCE_RATIO = 0.01
+
+
+class StreamingUnsupportedError(ValueError):
+    """A chain cannot be streamed block by block with reset=False"""
+
+
+def reset_chain(chain):
+    """Clear the internal state (tails, LFO phase, delay lines) of every plugin"""
+    if hasattr(chain, "reset"):
+        chain.reset()
+    else:
+        for plugin in chain:
+            plugin.reset()
+
+
+def clone_plugin(plugin):
+    """A new plugin of the same type and parameters, sharing no internal state
+
+    pedalboard plugins cannot be copied or pickled, so the copy is
+    constructed fresh and the public parameters are set on it. Containers
+    (Chain, Mix) are cloned recursively.
+    """
+    if hasattr(plugin, "__iter__"):
+        return type(plugin)([clone_plugin(p) for p in plugin])
+    clone = type(plugin)()
+    for name, value in plugin_parameters(plugin).items():
+        try:
+            setattr(clone, name, value)
+        except (AttributeError, TypeError, ValueError):
+            pass  # Read-only attributes such as is_effect
+    return clone
+
+
+def clone_chain(chain):
+    """A copy of a chain that can be reset and probed while the original is running"""
+    if hasattr(chain, "clone"):
+        return chain.clone()
+    return Pedalboard([clone_plugin(p) for p in chain])
+
+
+def pad_block(out, frames):
+    """Left-pad a short output block with silence to `frames` frames"""
+    if out.shape[0] >= frames:
+        return out
+    padded = np.zeros((frames,) + out.shape[1:], dtype=np.float32)
+    padded[frames - out.shape[0]:] = out
+    return padded
+
+
+def process_block(chain, block, sample_rate, block_size):
+    """Process one block without resetting plugin state.
+
+    With reset=False pedalboard holds back the first samples of plugins
+    that report latency and returns shorter blocks until it has. Those
+    samples come out here as leading silence, so the result always has as
+    many frames as the input and the stream is delayed by the chain
+    latency. Chains that keep returning short blocks after priming are
+    rejected by measure_latency(), so padding only happens while priming.
+
+    Offline renders (StreamingChain) and the benchmark stream through this
+    function. The live path uses process_block_into(), which makes the same
+    chain call on the same samples in pedalboard's channels-first layout,
+    so both produce bit-identical output for the same input.
+    """
+    if len(chain) == 0:
+        return block
+    return pad_block(chain(block, sample_rate, buffer_size=block_size, reset=False), block.shape[0])
+
+
+def process_block_into(chain, planar, out, sample_rate, block_size):
+    """Process one channels-first block into a preallocated output buffer.
+
+    Used by the live path to avoid per-block allocations. `planar` is a
+    C-contiguous float32 block shaped (channels, frames), pedalboard's
+    native layout, so no transposed copy is made inside the call. The
+    result is copied into `out`, shaped (frames, channels), left-padded
+    with silence exactly like process_block().
+
+    pedalboard has no way to render into a caller's buffer, so a non-empty
+    chain still allocates its result array. Returns the number of arrays
+    allocated so callers can account for them: 1 for a Pedalboard, or
+    what an EffectGraph or FilterBank reports in its `allocations`.
+    """
+    if len(chain) == 0:
+        np.copyto(out, planar.T)
+        return 0
+    result = chain(planar, sample_rate, buffer_size=block_size, reset=False)
+    missing = out.shape[0] - result.shape[-1]
+    if missing > 0:
+        out[:missing] = 0
+    np.copyto(out[missing:], result.T)
+    return getattr(chain, "allocations", 1)
+
+
+def _probe_tone(frames, sample_rate, channels):
+    t = np.arange(frames, dtype=np.float32) / sample_rate
+    tone = PROBE_LEVEL * np.sin(2 * np.pi * PROBE_FREQUENCY * t)
+    return np.repeat(tone[:, np.newaxis], channels, axis=1).astype(np.float32)
+
+
+def _stream_probe(chain, tone, sample_rate, block_size, check_blocks):
+    """Stream `tone` through the chain until it primes and then check_blocks more
+
+    Returns (latency, frames fed, primed output blocks); the latter is None
+    if the chain never returned a full block.
+    """
+    latency = 0
+    primed = None
+    fed = 0
+    for start in range(0, tone.shape[0], block_size):
+        out = chain(tone[start:start + block_size], sample_rate, buffer_size=block_size, reset=False)
+        fed += block_size
+        if primed is None:
+            latency += block_size - out.shape[0]
+            if out.shape[0] == block_size:
+                primed = []
+        if primed is not None:
+            primed.append(out)
+            if len(primed) >= check_blocks:
+                break
+    return latency, fed, primed
+
+
+def _probe(chain, sample_rate, block_size, channels, check):
+    """Stream a test tone through the chain. Returns (latency, problem or None)."""
+    max_blocks = int(np.ceil(MAX_PROBE_SECONDS * sample_rate / block_size))
+    check_blocks = max(CHECK_BLOCKS, int(np.ceil(CHECK_SECONDS * sample_rate / block_size))) if check else 1
+    tone = _probe_tone((max_blocks + check_blocks) * block_size, sample_rate, channels)
+    reset_chain(chain)
+    try:
+        latency, fed, primed = _stream_probe(chain, tone, sample_rate, block_size, check_blocks)
+        if not check or primed is None:
+            return latency, None
+        if any(out.shape[0] != block_size for out in primed):
+            return latency, "returns short blocks after priming, leaving gaps of silence"
+        reset_chain(chain)
+        reference = chain(tone[:fed], sample_rate, buffer_size=block_size, reset=True)[-len(primed) * block_size:]
+        reference_rms = np.sqrt(np.mean(np.square(reference)))
+        # The tone is steady, so every stretch of streamed output should be
+        # about as loud as the reference; dropouts show up as silent windows
+        streamed = np.concatenate(primed)
+        window = int(CHECK_WINDOW_SECONDS * sample_rate)
+        windows = streamed[:streamed.shape[0] // window * window].reshape(-1, window * streamed.shape[1])
+        if reference_rms > 1e-4 and np.sqrt(np.mean(np.square(windows), axis=1)).min() < SILENCE_RATIO * reference_rms:
+            return latency, "outputs silence"
+        return latency, None
+    finally:
+        reset_chain(chain)
+
+
+def measure_latency(chain, sample_rate, block_size, channels=1, check=True):
+    """Measure the chain's streaming latency in samples.
+
+    Streams a test tone through the chain until pedalboard returns a full
+    block and counts the samples it held back. This also allocates the
+    plugins' internal buffers, so it doubles as a warm-up. The chain is
+    reset before and after.
+
+    With `check`, raises StreamingUnsupportedError if the streamed output
+    drops to silence where a reset=True render of the same tone is not, or if
+    blocks still come back short after priming. PitchShift in pedalboard
+    0.9.x does both, at any block size.
+    """
+    if len(chain) == 0:
+        return 0
+
+    latency, problem = _probe(chain, sample_rate, block_size, channels, check)
+    if problem:
+        if isinstance(chain, Pedalboard):
+            # Name the plugins responsible rather than the whole chain
+            culprits = [type(plugin).__name__ for plugin in chain
+                        if _probe(Pedalboard([plugin]), sample_rate, block_size, channels, True)[1]]
+            name = ", ".join(culprits) or "The chain"
+        else:
+            name = f"The {type(chain).__name__}"
+        raise StreamingUnsupportedError(
+            f"{name} cannot be streamed in {block_size}-frame blocks: it {problem}. "
+            "Render it offline or leave it out of the live chain")
+    return latency
+
+
+class StreamingChain:
+    """Stateful block-by-block wrapper around a Pedalboard chain.
+
+    Keeps plugin state (reverb and delay tails, pitch-shifter buffers)
+    across blocks. With compensate_latency the samples pedalboard holds
+    back are simply not replaced, so the output lines up with the input;
+    without it the output is padded exactly like the live path. Raises
+    StreamingUnsupportedError for chains measure_latency() rejects.
+    """
+
+    def __init__(self, chain, sample_rate, block_size, channels=1, compensate_latency=False):
+        self.chain = chain
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self.compensate_latency = compensate_latency
+        self.latency = measure_latency(chain, sample_rate, block_size, channels)
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def reset(self):
+        reset_chain(self.chain)
+        self.frames_in = self.frames_out = 0
+
+    def process(self, block):
+        """Process one block. Compensated output may be shorter while the chain primes."""
+        if self.compensate_latency:
+            out = block if len(self.chain) == 0 else self.chain(
+                block, self.sample_rate, buffer_size=self.block_size, reset=False)
+        else:
+            out = process_block(self.chain, block, self.sample_rate, self.block_size)
+        self.frames_in += block.shape[0]
+        self.frames_out += out.shape[0]
+        return out
+
+    def flush(self, tail_seconds=0.0):
+        """Yield the remaining output by feeding silence through the chain.
+
+        Stops once the output covers everything fed in so far plus
+        `tail_seconds` of effect tail.
+        """
+        target = self.frames_in + int(round(tail_seconds * self.sample_rate))
+        silence = np.zeros((self.block_size, self.channels), dtype=np.float32)
+        # Bound the loop in case a plugin holds back more than it reported
+        max_blocks = (target - self.frames_out + self.latency) // self.block_size + 2
+        for _ in range(max_blocks):
+            if self.frames_out >= target:
+                break
+            out = self.process(silence)
+            if out.shape[0]:
+                yield out[:out.shape[0] - max(0, self.frames_out - target)]
@@ -0,0 +1,203 @@
+# streaming_recorder.py
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from ring_buffer import RingBuffer
+from stream_backends import SoundDeviceBackend
+
+DEFAULT_BLOCK_SIZE = 1024
+RING_SECONDS = 2.0          # Capture the writer may fall behind by before blocks are dropped
+BATCH_FRAMES = 65536        # Frames gathered per file write
+HEADER_FLUSH_SECONDS = 1.0  # How often the file header is brought up to date
+
+
+class StreamingRecorder:
+    """Records from an input stream straight to disk with constant memory
+
+    The input callback only copies each block into a preallocated ring.
+    A writer thread drains the ring into a batch buffer and appends it to
+    the file in large writes, flushing every `flush_seconds` so the header
+    stays valid and a crash loses at most that much of the take.
+
+    With `duration` (seconds) the recording stops by itself after exactly
+    that many frames; otherwise it runs until stop() is called. The first
+    `skip_frames` captured frames are discarded, which lets a caller start
+    the file on an exact sample of the stream (see synced_recording).
+
+    If the writer falls so far behind that the ring fills up, incoming
+    blocks are dropped and silence is written in their place, so the take
+    keeps its length and everything after the gap stays on the stream's
+    timeline. stop() warns about any dropped blocks.
+
+    Example:
+
+        with StreamingRecorder("take.wav", duration=30) as recorder:
+            recorder.wait()
+        print(recorder.frames_written)
+    """
+
+    def __init__(self, path, sample_rate=44100, channels=1, duration=None, subtype="PCM_16",
+                 block_size=DEFAULT_BLOCK_SIZE, backend=None, ring_seconds=RING_SECONDS,
+                 batch_frames=BATCH_FRAMES, flush_seconds=HEADER_FLUSH_SECONDS, skip_frames=0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.subtype = subtype
+        self.block_size = block_size
+        self.backend = backend or SoundDeviceBackend()
+        self.flush_seconds = flush_seconds
+        self.max_frames = None if duration is None else int(round(duration * sample_rate))
+        self.skip_frames = skip_frames
+        self._to_skip = skip_frames
+        num_blocks = max(2, int(np.ceil(ring_seconds * sample_rate / block_size)))
+        self.ring = RingBuffer(num_blocks, block_size, channels)
+        # Frames of silence owed before the block in each ring slot, for blocks dropped while it was full
+        self._gaps = np.zeros(num_blocks, dtype=np.int64)
+        self._pending_gap = 0
+        self._batch = np.zeros((max(1, batch_frames // block_size) * block_size, channels), dtype=np.float32)
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.dropped_blocks = 0
+        self.overflows = 0
+        # Device frame the take started at, when the backend reports it (armed streams do)
+        self.start_frame = None
+        self.finished = threading.Event()  # Set once the requested duration has been captured
+        self.stream = None
+        self._file = None
+        self._writer = None
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self, open_stream=True):
+        """Open the file and the input stream and start recording
+
+        With open_stream=False no stream is opened; the caller feeds
+        callback() itself, e.g. from a duplex stream it also plays on.
+        """
+        self.frames_captured = self.frames_written = self.dropped_blocks = self.overflows = 0
+        self._to_skip = self.skip_frames
+        self._gaps.fill(0)
+        self._pending_gap = 0
+        self.finished.clear()
+        self.ring.clear()
+        self._file = sf.SoundFile(self.path, 'w', self.sample_rate, self.channels, subtype=self.subtype)
+        self._running = True
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="recorder-writer")
+        self._writer.start()
+        if not open_stream:
+            return
+        self.stream = self.backend.open_input(channels=self.channels, samplerate=self.sample_rate,
+                                              blocksize=self.block_size, callback=self.callback)
+        self.stream.start()
+
+    def callback(self, indata, frames, time_info, status):
+        """Input stream callback: copy the block into the ring and nothing else"""
+        if status and status.input_overflow:
+            self.overflows += 1
+        if self.finished.is_set():
+            return
+        if self.ring.is_full():
+            # Only the writer frees slots, so this block is lost; it becomes silence
+            self.dropped_blocks += 1
+            self._pending_gap += frames
+        else:
+            self._gaps[self.ring.write_index % self.ring.num_blocks] = self._pending_gap
+            self.ring.write(indata)
+            self._pending_gap = 0
+        self.frames_captured += frames
+        if self.max_frames is not None and self.frames_captured >= self.skip_frames + self.max_frames:
+            self.finished.set()
+
+    def wait(self, timeout=None):
+        """Wait until `duration` has been captured. Without a duration this waits for stop()."""
+        return self.finished.wait(timeout)
+
+    def record(self):
+        """Record for the full duration and close the file. Returns the number of frames written."""
+        if self.max_frames is None:
+            raise ValueError("record() needs a duration; use start()/stop() for open-ended takes")
+        self.start()
+        try:
+            self.wait()
+        finally:
+            self.stop()
+        return self.frames_written
+
+    def stop(self):
+        """Stop the stream, write everything still buffered and close the file"""
+        if self.stream:
+            self.start_frame = getattr(self.stream, "start_frame", None)
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        self._running = False
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+        if self._file:
+            # Blocks dropped at the very end are owed as silence too
+            while self._pending_gap:
+                n = min(self._pending_gap, self._batch.shape[0])
+                self._batch[:n] = 0
+                self._write(n)
+                self._pending_gap -= n
+            self._file.close()
+            self._file = None
+        if self.dropped_blocks:
+            print(f"Warning: the writer fell behind and {self.dropped_blocks} blocks "
+                  f"({self.dropped_blocks * self.block_size / self.sample_rate:.2f} s) were recorded as silence")
+        self.finished.set()
+
+    def _write_loop(self):
+        idle_sleep = self.block_size / self.sample_rate / 2
+        last_flush = time.monotonic()
+        while True:
+            # Read _running before draining so nothing captured before stop() is missed
+            running = self._running
+            filled = self._drain()
+            if filled:
+                self._write(filled)
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self._file.flush()  # Rewrites the header to cover everything written so far
+                last_flush = time.monotonic()
+            if not running and self.ring.is_empty():
+                break
+            if filled < self._batch.shape[0]:
+                time.sleep(idle_sleep)
+
+    def _drain(self):
+        """Move buffered blocks into the batch buffer. Returns the number of frames moved."""
+        batch = self._batch
+        filled = 0
+        while filled < batch.shape[0] and not self.ring.is_empty():
+            slot = self.ring.read_index % self.ring.num_blocks
+            gap = self._gaps[slot]
+            if gap:
+                # Silence for blocks dropped before this one
+                n = min(gap, batch.shape[0] - filled)
+                batch[filled:filled + n] = 0
+                self._gaps[slot] = gap - n
+                filled += n
+                continue
+            self.ring.read_into(batch[filled:filled + self.block_size])
+            filled += self.block_size
+        return filled
+
+    def _write(self, frames):
+        start = 0
+        if self._to_skip:
+            start = min(self._to_skip, frames)
+            self._to_skip -= start
+        if self.max_frames is not None:
+            # The last block may run past the requested duration
+            frames = min(frames, start + self.max_frames - self.frames_written)
+        if frames > start:
+            self._file.write(self._batch[start:frames])
+            self.frames_written += frames - start
@@ -0,0 +1,218 @@
+# synced_recording.py
+import json
+import os
+import platform
+import threading
+import time
+import numpy as np
+from click_track import ClickTrack, synthesize_click, DEFAULT_BEATS_PER_BAR
+from stream_backends import SoundDeviceBackend, cross_correlation
+from streaming_recorder import StreamingRecorder, DEFAULT_BLOCK_SIZE
+
+PROBE_PREROLL_BLOCKS = 4      # Silence before the probe, so the device has settled
+MAX_ROUND_TRIP_SECONDS = 0.5  # Longest round trip the probe listens for
+DETECTION_LEVEL = 1e-3        # Input peak below which no loopback is assumed
+# How far the correlation peak must stand above its median level. Noise and
+# hum without a loopback reach about 6; a cabled loopback is in the hundreds.
+MIN_PEAK_RATIO = 20.0
+
+# Measured round-trip latencies per machine and device, next to the tuner's profiles
+LATENCY_PATH = os.path.join(os.path.expanduser("~"), ".config", "audiosignalchain", "latency_profiles.json")
+
+
+def bar_frames(bpm, sample_rate, bars=1, beats_per_bar=DEFAULT_BEATS_PER_BAR):
+    """Length of `bars` bars in frames, matching where ClickTrack places the beats"""
+    return int(round(bars * beats_per_bar * 60.0 * sample_rate / bpm))
+
+
+class LatencyProbe:
+    """Measures round-trip latency by playing an impulse into a loopback
+
+    The output has to reach the input: a cable from the interface's
+    output to its input, or a VirtualDevice(loopback=...). Playback and
+    capture run on one duplex stream, so the result is in stream frames
+    and covers both converters and all driver buffering.
+    """
+
+    def __init__(self, backend=None, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE, channels=1,
+                 max_latency=MAX_ROUND_TRIP_SECONDS):
+        self.backend = backend or SoundDeviceBackend()
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self.preroll = PROBE_PREROLL_BLOCKS * block_size
+        impulse = synthesize_click(sample_rate, 3000.0, 0.005)
+        self.max_lag = int(max_latency * sample_rate)
+        self.played = np.zeros(self.preroll + len(impulse) + self.max_lag, dtype=np.float32)
+        self.played[self.preroll:self.preroll + len(impulse)] = impulse
+        self.captured = np.zeros_like(self.played)
+        self.position = 0
+        self.done = threading.Event()
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        start = self.position
+        n = max(0, min(frames, len(self.played) - start))
+        outdata.fill(0)
+        if n:
+            outdata[:n] = self.played[start:start + n, np.newaxis]
+            self.captured[start:start + n] = indata[:n].mean(axis=1)
+        self.position += frames
+        if self.position >= len(self.played):
+            self.done.set()
+
+    def measure(self, timeout=5.0):
+        """Play the probe and return the round-trip latency in frames"""
+        self.position = 0
+        self.captured.fill(0)
+        self.done.clear()
+        stream = self.backend.open_duplex(channels=(self.channels, self.channels), samplerate=self.sample_rate,
+                                          blocksize=self.block_size, callback=self.callback)
+        stream.start()
+        try:
+            if not self.done.wait(timeout):
+                raise RuntimeError("Latency probe timed out")
+        finally:
+            stream.stop()
+            stream.close()
+        if np.max(np.abs(self.captured)) < DETECTION_LEVEL:
+            raise RuntimeError("No loopback signal detected. Cable the interface's output to its input and "
+                               "run `python main.py calibrate-latency` to measure and store the latency")
+        corr = cross_correlation(self.played, self.captured, max_lag=self.max_lag)
+        latency = int(np.argmax(corr))
+        # The probe coming back gives one sharp peak; noise or hum on an
+        # uncabled input only gives a maximum a few times the typical level
+        if corr[latency] <= MIN_PEAK_RATIO * np.median(np.abs(corr)):
+            raise RuntimeError("The probe did not come back clearly, only noise was heard. Cable the interface's "
+                               "output to its input and run `python main.py calibrate-latency` again")
+        return latency
+
+
+def measure_round_trip(backend=None, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE, channels=1):
+    """Round-trip latency of `backend` in frames (see LatencyProbe)"""
+    return LatencyProbe(backend, sample_rate, block_size, channels).measure()
+
+
+def _latency_key(device, sample_rate, block_size):
+    return f"{device or 'default'}@{sample_rate}/{block_size}"
+
+
+def load_latency(device, sample_rate, block_size, path=LATENCY_PATH):
+    """This machine's stored round-trip latency in frames for a device (name or None), or None"""
+    from tuner import load_profiles
+    entry = load_profiles(path).get(platform.node(), {}).get(_latency_key(device, sample_rate, block_size))
+    return entry["latency"] if entry else None
+
+
+def save_latency(device, sample_rate, block_size, latency, path=LATENCY_PATH):
+    """Store a measured round-trip latency for this machine and device"""
+    from tuner import load_profiles
+    profiles = load_profiles(path)
+    machine = profiles.setdefault(platform.node(), {})
+    machine[_latency_key(device, sample_rate, block_size)] = {"latency": latency,
+                                                             "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profiles, f, indent=2)
+
+
+def calibrate_latency(backend=None, device=None, sample_rate=44100, block_size=DEFAULT_BLOCK_SIZE, channels=1,
+                      path=LATENCY_PATH):
+    """Measure the round-trip latency through a loopback and store it for later takes"""
+    latency = measure_round_trip(backend, sample_rate, block_size, channels)
+    save_latency(device, sample_rate, block_size, latency, path)
+    return latency
+
+
+class SyncedRecorder:
+    """Records a take against a click, both driven by one duplex stream
+
+    The click is mixed into the output and the input is captured in the
+    same callback, so they share one frame counter. A beat played at
+    stream frame b comes back as the player's note at input frame
+    b + latency, so the recorder discards everything before the first beat
+    after the count-in plus the round-trip latency: file sample 0 is beat 1,
+    and bar n starts at bar_frames(bpm, sample_rate, n).
+
+    `latency` is in frames. If None, the value stored for `device` (the
+    name the latency was calibrated under) by calibrate_latency() is used,
+    and start() raises RuntimeError if there is none: a take never
+    measures or stores a latency by itself. Pass latency=0 to skip
+    compensation.
+    """
+
+    def __init__(self, path, bpm, duration, sample_rate=44100, channels=1, latency=None, count_in_bars=1,
+                 accents=None, click=None, subtype="PCM_16", block_size=DEFAULT_BLOCK_SIZE, backend=None,
+                 output_channels=1, device=None):
+        self.bpm = bpm
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.output_channels = output_channels
+        self.block_size = block_size
+        self.backend = backend or SoundDeviceBackend()
+        self.latency = latency
+        self.device = device
+        self.count_in_bars = count_in_bars
+        self.accents = accents
+        self.click = click
+        self.recorder = StreamingRecorder(path, sample_rate, channels, duration, subtype, block_size,
+                                          backend=self.backend)
+        self.track = None
+        self.first_beat = None  # Stream frame of beat 1 of the take
+        self.stream = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def frames_written(self):
+        return self.recorder.frames_written
+
+    def start(self):
+        """Look up the calibrated latency if needed, then start the click and the capture"""
+        if self.latency is None:
+            self.latency = load_latency(self.device, self.sample_rate, self.block_size)
+            if self.latency is None:
+                device = f" --device {self.device}" if self.device else ""
+                raise RuntimeError(
+                    f"No round-trip latency calibrated for {self.device or 'the default device'} at "
+                    f"{self.sample_rate} Hz / {self.block_size} frames. Cable the output to the input and run "
+                    f"`python main.py calibrate-latency{device} --sample-rate {self.sample_rate} "
+                    f"--block-size {self.block_size}` in pedalboard/, or pass latency=0 to skip compensation")
+            print(f"Round-trip latency: {self.latency} frames "
+                  f"({1000.0 * self.latency / self.sample_rate:.1f} ms)")
+        self.track = ClickTrack(self.bpm, self.sample_rate, accents=self.accents, click=self.click)
+        self.first_beat = bar_frames(self.bpm, self.sample_rate, self.count_in_bars, self.track.beats_per_bar)
+        self.recorder.skip_frames = self.first_beat + self.latency
+        self.recorder.start(open_stream=False)
+        self.stream = self.backend.open_duplex(channels=(self.channels, self.output_channels),
+                                               samplerate=self.sample_rate, blocksize=self.block_size,
+                                               callback=self.callback)
+        self.stream.start()
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        outdata.fill(0)
+        self.track.mix_into(outdata)
+        self.recorder.callback(indata, frames, time_info, status)
+
+    def wait(self, timeout=None):
+        return self.recorder.wait(timeout)
+
+    def record(self):
+        """Count in, record the full duration and close the file. Returns the number of frames written."""
+        self.start()
+        try:
+            self.wait()
+        finally:
+            self.stop()
+        return self.frames_written
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        self.recorder.stop()
@@ -0,0 +1,137 @@
+# telemetry.py
+import bisect
+import os
+import time
+
+# Upper bounds of the processing-time histogram buckets, as a fraction of
+# the block deadline (block_size / sample_rate). Anything above 1.0 missed it.
+DEADLINE_BUCKETS = (0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.5, 2.0, float("inf"))
+
+COUNTERS = (
+    "blocks_processed",
+    "input_overflows",     # PortAudio reported input overflow
+    "output_underflows",   # PortAudio reported output underflow
+    "input_dropped",       # Input ring was full, block discarded
+    "output_dropped",      # Output ring was full, processed block discarded
+    "zero_filled",         # Output callback had nothing to play and wrote silence
+    "deadline_misses",     # Processing took longer than one block
+    "allocations",         # Arrays allocated while processing (chain results that cannot be written in place)
+    "param_errors",        # Queued parameter changes the plugin rejected, dropped on the audio thread
+)
+
+
+class ProcessorStats:
+    """Counters and histograms for the real-time path.
+
+    Updates are plain integer increments on preallocated lists so they are
+    cheap enough to call from audio callbacks.
+    """
+
+    def __init__(self, block_size, sample_rate):
+        self.deadline = block_size / sample_rate
+        self._bucket_bounds = [b * self.deadline for b in DEADLINE_BUCKETS]
+        self.reset()
+
+    def reset(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histogram = [0] * len(DEADLINE_BUCKETS)
+        self.total_processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.ring_occupancy = {}
+        self.ring_occupancy_max = {}
+        self.started_at = time.time()
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record_status(self, status):
+        """Count the xrun flags of a sounddevice CallbackFlags"""
+        if status.input_overflow:
+            self.counters["input_overflows"] += 1
+        if status.output_underflow:
+            self.counters["output_underflows"] += 1
+
+    def record_processing_time(self, seconds):
+        self.counters["blocks_processed"] += 1
+        self.histogram[bisect.bisect_left(self._bucket_bounds, seconds)] += 1
+        self.total_processing_time += seconds
+        if seconds > self.max_processing_time:
+            self.max_processing_time = seconds
+        if seconds > self.deadline:
+            self.counters["deadline_misses"] += 1
+
+    def record_occupancy(self, name, blocks):
+        self.ring_occupancy[name] = blocks
+        if blocks > self.ring_occupancy_max.get(name, 0):
+            self.ring_occupancy_max[name] = blocks
+
+    def snapshot(self):
+        """Return a plain-dict copy of the current statistics"""
+        blocks = self.counters["blocks_processed"]
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "deadline_seconds": self.deadline,
+            "counters": dict(self.counters),
+            "processing_time_mean": self.total_processing_time / blocks if blocks else 0.0,
+            "processing_time_max": self.max_processing_time,
+            "deadline_histogram": {
+                ("+Inf" if bound == float("inf") else f"{bound:g}"): count
+                for bound, count in zip(DEADLINE_BUCKETS, self.histogram)
+            },
+            "ring_occupancy": dict(self.ring_occupancy),
+            "ring_occupancy_max": dict(self.ring_occupancy_max),
+        }
+
+
+def format_stats(stats):
+    """Format a get_stats() snapshot as a one-line summary"""
+    c = stats["counters"]
+    load = stats["processing_time_mean"] / stats["deadline_seconds"] if stats["deadline_seconds"] else 0.0
+    rings = " ".join(f"{name}={depth}/{stats['ring_occupancy_max'].get(name, depth)}"
+                     for name, depth in stats["ring_occupancy"].items())
+    return (f"blocks={c['blocks_processed']} load={load:.0%} "
+            f"max={1000.0 * stats['processing_time_max']:.2f}ms "
+            f"misses={c['deadline_misses']} overflows={c['input_overflows']} "
+            f"underflows={c['output_underflows']} zero_filled={c['zero_filled']} "
+            f"dropped={c['input_dropped'] + c['output_dropped']} "
+            f"allocs/block={c['allocations'] / max(1, c['blocks_processed']):.1f} {rings}").rstrip()
+
+
+def write_prometheus(stats, path, prefix="effects_processor"):
+    """Write a get_stats() snapshot in the Prometheus text exposition format.
+
+    The file is written to a temporary name and renamed into place so a
+    scraper (e.g. the node_exporter textfile collector) never reads a
+    partial file.
+    """
+    lines = []
+    for name, value in stats["counters"].items():
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+
+    lines.append(f"# TYPE {prefix}_deadline_seconds gauge")
+    lines.append(f"{prefix}_deadline_seconds {stats['deadline_seconds']}")
+
+    # Histogram of processing time, bucketed by fraction of the deadline
+    hist = f"{prefix}_block_deadline_ratio"
+    lines.append(f"# TYPE {hist} histogram")
+    cumulative = 0
+    for bound, count in stats["deadline_histogram"].items():
+        cumulative += count
+        lines.append(f'{hist}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f"{hist}_count {cumulative}")
+    blocks = stats["counters"]["blocks_processed"]
+    ratio_sum = stats["processing_time_mean"] * blocks / stats["deadline_seconds"] if stats["deadline_seconds"] else 0.0
+    lines.append(f"{hist}_sum {ratio_sum}")
+
+    lines.append(f"# TYPE {prefix}_ring_occupancy_blocks gauge")
+    for name, depth in stats["ring_occupancy"].items():
+        lines.append(f'{prefix}_ring_occupancy_blocks{{ring="{name}"}} {depth}')
+    lines.append(f"# TYPE {prefix}_ring_occupancy_max_blocks gauge")
+    for name, depth in stats["ring_occupancy_max"].items():
+        lines.append(f'{prefix}_ring_occupancy_max_blocks{{ring="{name}"}} {depth}')
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
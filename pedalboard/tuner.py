@@ -0,0 +1,107 @@
+# tuner.py
+import json
+import os
+import platform
+import time
+from effects_processor import EffectsProcessor
+from effects_presets import get_effect_presets
+from stream_backends import SoundDeviceBackend, VirtualDevice
+
+DEFAULT_BLOCK_SIZES = (64, 128, 256, 512, 1024, 2048, 4096)
+DEFAULT_QUEUE_DEPTHS = (2, 3, 4, 6, 8)
+DEFAULT_TARGET_XRUN_RATE = 0.001  # At most one glitch per 1000 blocks
+DEFAULT_HEADROOM = 0.5            # Mean processing time must stay under half the block deadline
+DEFAULT_TRIAL_SECONDS = 5.0
+WARMUP_SECONDS = 0.5              # Ignored at the start of each trial while rings prime
+
+PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".config", "audiosignalchain", "tuning_profiles.json")
+
+XRUN_COUNTERS = ("input_overflows", "output_underflows", "input_dropped", "output_dropped", "zero_filled")
+
+
+def run_trial(preset_name, sample_rate, block_size, queue_blocks, mode="threaded", duration=DEFAULT_TRIAL_SECONDS,
+              live=False):
+    """Run a preset at one block size / queue depth and return its xrun rate and CPU load"""
+    if live:
+        backend = SoundDeviceBackend()
+    else:
+        from benchmark import synthesize_guitar
+        backend = VirtualDevice(synthesize_guitar(10.0, sample_rate), samplerate=sample_rate,
+                                blocksize=block_size, loop=True, duration=WARMUP_SECONDS + duration)
+
+    processor = EffectsProcessor(sample_rate=sample_rate, block_size=block_size, queue_blocks=queue_blocks,
+                                 mode=mode, backend=backend)
+    if preset_name:
+        processor.set_chain(get_effect_presets()[preset_name]())
+
+    processor.start()
+    try:
+        time.sleep(WARMUP_SECONDS)
+        processor.stats.reset()
+        time.sleep(duration)
+        stats = processor.get_stats()
+    finally:
+        processor.stop()
+
+    blocks = max(1, stats["counters"]["blocks_processed"])
+    xruns = sum(stats["counters"][name] for name in XRUN_COUNTERS)
+    return {
+        "block_size": block_size,
+        "queue_blocks": queue_blocks,
+        "xrun_rate": xruns / blocks,
+        "cpu_load": stats["processing_time_mean"] / stats["deadline_seconds"],
+        "max_load": stats["processing_time_max"] / stats["deadline_seconds"],
+        "latency_ms": 1000.0 * block_size * (queue_blocks if mode == "threaded" else 1) / sample_rate,
+    }
+
+
+def tune(preset_name, sample_rate=44100, mode="threaded", block_sizes=DEFAULT_BLOCK_SIZES,
+         queue_depths=DEFAULT_QUEUE_DEPTHS, target_xrun_rate=DEFAULT_TARGET_XRUN_RATE,
+         headroom=DEFAULT_HEADROOM, duration=DEFAULT_TRIAL_SECONDS, live=False, progress=print):
+    """Find the smallest block size (then queue depth) that meets the xrun and CPU targets
+
+    Block sizes are tried from smallest to largest; once the CPU load fits
+    within the headroom, queue depths are tried from shallowest to deepest.
+    Returns the first passing trial, or None if nothing passed.
+    """
+    depths = queue_depths if mode == "threaded" else queue_depths[:1]
+    for block_size in sorted(block_sizes):
+        for queue_blocks in sorted(depths):
+            trial = run_trial(preset_name, sample_rate, block_size, queue_blocks, mode, duration, live)
+            passed = trial["xrun_rate"] <= target_xrun_rate and trial["cpu_load"] <= 1.0 - headroom
+            if progress:
+                progress(f"block {block_size:>5} queue {queue_blocks}: xruns {trial['xrun_rate']:.4f}/block, "
+                         f"load {trial['cpu_load']:.0%} (max {trial['max_load']:.0%}) "
+                         f"{'ok' if passed else 'fail'}")
+            if passed:
+                return trial
+            if trial["cpu_load"] > 1.0 - headroom:
+                break  # Deeper queues do not help a block size that is too CPU-hungry
+    return None
+
+
+def _profile_key(preset_name, sample_rate, mode):
+    return f"{preset_name or 'None'}@{sample_rate}/{mode}"
+
+
+def load_profiles(path=PROFILE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_profile(preset_name, sample_rate, mode, trial, path=PROFILE_PATH):
+    """Store a tuning result for this machine and preset"""
+    profiles = load_profiles(path)
+    machine = profiles.setdefault(platform.node(), {})
+    machine[_profile_key(preset_name, sample_rate, mode)] = dict(trial, tuned_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profiles, f, indent=2)
+
+
+def load_profile(preset_name, sample_rate, mode, path=PROFILE_PATH):
+    """Get this machine's tuning result for a preset, or None"""
+    return load_profiles(path).get(platform.node(), {}).get(_profile_key(preset_name, sample_rate, mode))
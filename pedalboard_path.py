@@ -0,0 +1,21 @@
+# pedalboard_path.py
+"""
+Make the real-time modules in pedalboard/ importable from scripts outside it.
+
+Those modules import each other by flat name (main.py runs from inside
+pedalboard/), so scripts at the repository root import this module before
+any of them:
+
+    import pedalboard_path  # noqa: F401
+    from device_registry import get_registry
+
+Scripts in scratch/ do the same and are run from the repository root as
+modules, e.g. `python -m scratch.audio_playback_and_recording_system`.
+"""
+import os
+import sys
+
+MODULE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pedalboard")
+
+if MODULE_DIR not in sys.path:
+    sys.path.append(MODULE_DIR)
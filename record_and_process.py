@@ -1,15 +1,20 @@
+import argparse
 import os
 import sounddevice as sd
 import numpy as np
-import wave
 from typing import Tuple  # Added this import
 
 from pedalboard_native import Compressor, Bitcrush
 from pydub import AudioSegment
-from pydub.effects import normalize, speedup
 from pedalboard import Pedalboard, Reverb, Delay, Chorus, Phaser
 import librosa
-import scipy.signal as signal
+
+from audio_pipeline import Pipeline, Normalize, ToMono, Effects, TimeStretch, Reverse, Loop
+
+import pedalboard_path  # noqa: F401
+from device_registry import get_registry
+from iir_filter import FilterBank, IIRFilter
+from streaming_recorder import StreamingRecorder
 
 # Constants
 AUDIO_DIR = "audio"
@@ -21,6 +26,18 @@ DEFAULT_SAMPLE_WIDTH = 2
 from metronome import record_with_metronome
 
 
+def create_effects_board():
+    """The effects chain applied to every take."""
+    return Pedalboard([
+        Reverb(room_size=0.3, wet_level=0.2),
+        Delay(delay_seconds=0.25),
+        Chorus(rate_hz=0.5, depth=0.5, centre_delay_ms=7.0, feedback=0.5, mix=0.5),
+        Compressor(),
+        Phaser(rate_hz=0.5, depth=0.5, centre_frequency_hz=1300.0, feedback=0.5, mix=0.5),
+        # Bitcrush(bit_depth=8)
+    ])
+
+
 def add_effects(audio_data, sample_rate):
     # Get the raw audio data as numpy array
     samples = np.array(audio_data.get_array_of_samples())
@@ -36,14 +53,7 @@ def add_effects(audio_data, sample_rate):
         samples = samples.reshape(-1, 2).mean(axis=1)
 
     # Create and apply effects
-    board = Pedalboard([
-        Reverb(room_size=0.3, wet_level=0.2),
-        Delay(delay_seconds=0.25),
-        Chorus(rate_hz=0.5, depth=0.5, centre_delay_ms=7.0, feedback=0.5, mix=0.5),
-        Compressor(),
-        Phaser(rate_hz=0.5, depth=0.5, centre_frequency_hz=1300.0, feedback=0.5, mix=0.5),
-        # Bitcrush(bit_depth=8)
-    ])
+    board = create_effects_board()
 
     # Process audio through effects
     effected = board.process(samples, sample_rate)
@@ -96,39 +106,46 @@ def create_loop_from_file(audio_path, num_loops=4):
 
 
 def apply_highpass_filter(audio, cutoff_freq, sample_rate):
-    nyquist = 0.5 * sample_rate
-    normal_cutoff = cutoff_freq / nyquist
-    b, a = signal.butter(1, normal_cutoff, btype='high', analog=False)
-    filtered_audio = signal.lfilter(b, a, np.array(audio.get_array_of_samples()))
-    return AudioSegment(data=filtered_audio.tobytes(), sample_width=audio.sample_width, frame_rate=audio.frame_rate,
-                        channels=audio.channels)
+    bank = FilterBank([IIRFilter("highpass", cutoff_freq, order=1)])
+    scale = float(1 << (8 * audio.sample_width - 1))
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32).reshape(-1, audio.channels) / scale
+    filtered = np.clip(bank(samples, sample_rate) * scale, -scale, scale - 1)
+    return AudioSegment(data=filtered.astype(f"<i{audio.sample_width}").tobytes(), sample_width=audio.sample_width,
+                        frame_rate=audio.frame_rate, channels=audio.channels)
+
+
+def arm_scarlett(sample_rate=44100, channels=2):
+    """Open the Scarlett's input ahead of the take, so recording starts without device setup"""
+    registry = get_registry()
+    registry.watch_hotplug()
+    device_index = registry.find('Aggregate')
+    if device_index is None:
+        return None
+    try:
+        return registry.arm_input(device_index, channels, sample_rate)
+    except Exception as e:
+        print(f"Could not arm input {device_index}: {e}")
+        return None
 
 
 def record_audio(output_file: object, record_seconds: object = 5, sample_rate: object = 44100,
                  channels: object = 1) -> None:
-    # Find the Scarlett Focusrite device index
-    device_index = None
-    devices = sd.query_devices()
-    for i, device in enumerate(devices):
-        print(f"{i}: {device['name']}")
-        if 'Aggregate' in device['name']:
-            device_index = i
-            channels = 2
-            break
+    # Find the Scarlett Focusrite device index; the lookup is cached after the first take
+    registry = get_registry()
+    device_index = registry.find('Aggregate')
     if device_index is None:
         raise ValueError("Scarlett Focusrite device not found")
+    channels = 2
+    print(f"Input device {device_index}: {registry.devices()[device_index]['name']}")
 
     print(f"Recording for {record_seconds} seconds...")  # f-string (recommended)
-    audio_data = sd.rec(int(record_seconds * sample_rate), samplerate=sample_rate, channels=channels, dtype='int16',
-                        device=device_index)
-    sd.wait()
-    print("Finished recording.")
-
-    with wave.open(output_file, 'wb') as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(2)
-        wf.setframerate(sample_rate)
-        wf.writeframes(audio_data.tobytes())
+    # Streams to disk as it records, so long takes use constant memory and
+    # a crash keeps everything up to the last header flush
+    recorder = StreamingRecorder(output_file, sample_rate=sample_rate, channels=channels,
+                                 duration=record_seconds, subtype="PCM_16",
+                                 backend=registry.backend_for(input_device=device_index))
+    recorder.record()
+    print(f"Finished recording ({recorder.frames_written} frames).")
 
 
 def calculate_record_seconds(num_bars, tempo_bpm, playback_speed, num_loops):
@@ -155,6 +172,21 @@ def calculate_record_seconds(num_bars, tempo_bpm, playback_speed, num_loops):
     return record_duration
 
 
+def record_audio_synced(output_file, tempo_bpm, record_seconds, latency=None):
+    """Record from the Scarlett against a click, with beat 1 on sample 0 of the file
+
+    The round-trip latency comes from this machine's calibration
+    (`python main.py calibrate-latency --device Aggregate` in pedalboard/,
+    with the output cabled to the input); without one this raises
+    RuntimeError.
+    """
+    registry = get_registry()
+    if registry.find('Aggregate') is None or registry.find('Aggregate', 'output') is None:
+        raise ValueError("Scarlett Focusrite device not found")
+    record_with_metronome(output_file, tempo_bpm, record_seconds, channels=2, latency=latency,
+                          backend=registry.backend_for('Aggregate', 'Aggregate'), device='Aggregate')
+
+
 def ensure_directory_exists(directory_path: str) -> None:
     """Create directory if it doesn't exist."""
     if not os.path.exists(directory_path):
@@ -177,36 +209,26 @@ def process_audio(
         cutoff_freq: float = 1000.0
 ) -> None:
     """Process audio with a chain of effects."""
-    # Load the recorded audio
-    audio = AudioSegment.from_wav(input_file)
-    sample_rate = audio.frame_rate
-
-    # Apply processing chain
-    audio = normalize(audio)
-
-    # Add effects and convert back to AudioSegment
-    audio_with_effects, sr = add_effects(audio, sample_rate=sample_rate)
-    audio = AudioSegment(
-        audio_with_effects.tobytes(),
-        frame_rate=sr,
-        sample_width=DEFAULT_SAMPLE_WIDTH,
-        channels=DEFAULT_CHANNELS
-    )
+    # The take stays one float32 buffer from load to export and is
+    # quantized to 16-bit only once, when the output file is written
+    stages = [
+        Normalize(),
+        ToMono(),
+        Effects(create_effects_board()),
+    ]
 
     # Apply speed and direction changes
-
-    if (playback_speed > 1):
-        audio = speedup(audio, playback_speed)
+    if playback_speed != 1:
+        stages.append(TimeStretch(playback_speed))
 
     # Reverse the audio
-    audio = audio.reverse()
+    stages.append(Reverse())
 
-    # Apply filter and create loop
-    #audio = apply_highpass_filter(audio, cutoff_freq, sample_rate)
-    audio = create_loop(audio, num_loops)
+    # Create loop (the high-pass filter stays off, as before; see apply_highpass_filter)
+    stages.append(Loop(num_loops))
 
     # Export the processed audio
-    audio.export(output_file, format="wav")
+    Pipeline(stages).render(input_file, output_file, subtype="PCM_16")
     print(f"Processed audio saved to {output_file}")
 
 
@@ -219,6 +241,14 @@ def play_audio_file(file_path: str) -> None:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Record a take, process it and play it back")
+    parser.add_argument("--synced", action="store_true",
+                        help="Record against a click with beat 1 on the first sample of the take "
+                             "(needs a calibrated round-trip latency, see record_audio_synced)")
+    args = parser.parse_args()
+
+    arm_scarlett()
+
     # Configuration parameters
     num_bars = 4
     target_tempo = 120
@@ -237,8 +267,11 @@ def main():
     # Setup input and output paths
     input_file, output_file = setup_audio_paths()
 
-    # Record audio
-    record_audio(input_file, record_seconds)
+    if args.synced:
+        # Record against the click, so the take starts exactly on beat 1
+        record_audio_synced(input_file, target_tempo, record_seconds)
+    else:
+        record_audio(input_file, record_seconds)
 
     # Process and play the audio
     process_audio(input_file, output_file, playback_speed, num_loops, cutoff_freq)
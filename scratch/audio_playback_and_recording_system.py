@@ -5,6 +5,9 @@ import queue
 import threading
 from typing import List, Tuple, Optional
 
+import pedalboard_path  # noqa: F401  (run from the repository root: python -m scratch.<name>)
+from device_registry import get_registry
+
 # Define note frequencies (A4 = 440Hz as reference)
 NOTE_FREQUENCIES = {
     'C4': 261.63, 'C#4': 277.18, 'D4': 293.66, 'D#4': 311.13,
@@ -31,11 +34,12 @@ class AudioRecorder:
     def start_recording(self, device: Optional[int] = None) -> None:
         self.recording = True
         self.audio_queue = queue.Queue()
-        self.stream = sd.InputStream(
-            samplerate=self.sample_rate,
+        # Armed streams stay open between takes, so recording starts immediately
+        self.stream = get_registry().backend_for(device).open_input(
             channels=1,
-            callback=self.callback,
-            device=device
+            samplerate=self.sample_rate,
+            blocksize=1024,
+            callback=self.callback
         )
         self.stream.start()
 
@@ -76,12 +80,7 @@ def generate_sine_wave(frequency, duration, sample_rate=44100):
 
 
 def get_available_devices():
-    devices = sd.query_devices()
-    input_devices = []
-    for i, device in enumerate(devices):
-        if device['max_input_channels'] > 0:
-            input_devices.append(f"{i}: {device['name']}")
-    return input_devices
+    return [f"{i}: {device['name']}" for i, device in get_registry().input_devices()]
 
 
 recorder = AudioRecorder()
@@ -106,6 +105,18 @@ def play_chord(root_note: str, chord_type: str) -> str:
     return f"Playing {root_note} {chord_type} chord"
 
 
+def select_device(device_str: str) -> str:
+    """Open the chosen input now, so the first take starts without device setup"""
+    if not device_str:
+        return ""
+    device_idx = int(device_str.split(':')[0])
+    try:
+        get_registry().arm_input(device_idx, channels=1, samplerate=recorder.sample_rate)
+    except Exception as e:
+        return f"Could not open {device_str}: {e}"
+    return f"{device_str} ready"
+
+
 def start_recording(device_str: str) -> str:
     device_idx = int(device_str.split(':')[0])
     recorder.start_recording(device_idx)
@@ -165,6 +176,12 @@ with gr.Blocks() as interface:
         loop_toggle = gr.Checkbox(label="Loop Playback")
         loop_status = gr.Text(label="Loop Status")
 
+        device_dropdown.change(
+            select_device,
+            inputs=[device_dropdown],
+            outputs=[status_text]
+        )
+
         record_btn.click(
             start_recording,
             inputs=[device_dropdown],
@@ -183,4 +200,5 @@ with gr.Blocks() as interface:
         )
 
 if __name__ == "__main__":
+    get_registry().watch_hotplug()
     interface.launch()
\ No newline at end of file